@@ -1,249 +1,136 @@
 #!/usr/bin/env python3
 
+import os
 import sys
-from Formats.BIN import *
-from Formats.FONT import do_extract_font, do_insert_font
-from Formats.MSG import do_extract_msg, do_decode_block, do_insert_msg, do_encode_text_block
-from Formats.TIM import do_extract_tim, do_insert_tim
+
+from Formats.BIN import do_report_store
+from Formats.EXE import do_report_free_space, do_add_free_range
+
+from Tools.BATCH import do_batch_extract, do_batch_insert, do_batch_check, do_batch_export_png
+from Tools.EDITOR import do_list_file, do_extract_file, do_insert_exe, do_insert_folder, do_update_folder
+from Tools.EDITOR import do_verify_folder
+from Tools.IMAGE import do_extract_image, do_insert_image
+from Tools.MEMORY import do_report_memory, do_propagate_memory
+from Tools.WATCH import do_watch
 
 
 help_msg = (
     """\nDashEditor v0.9.5 - Mega Man Legends Translation Toolkit
 Created by _Ombra_ of SadNES cITy Translations
 Website: http://www.sadnescity.it\n
-DashEditor.py [option] [file_or_folder]\n
+DashEditor.py [option] [file_or_folder]
+DashEditor.py [batch option] [folder_or_glob_or_image] [workers]\n
   -e   extracts che content of BIN file.
-  -i   inserts an extracted folder to BIN file.\n""")
-
-# Check if 2 arguments are passed
-if len(sys.argv) != 3:
-    print("{}\nOne or more arguments missing or too many".format(help_msg))
-# If they are, check if the command argument is valid
-elif not any(cmd in sys.argv[1] for cmd in ("-e", "-i")):
-    print("{}\nInvalid command!".format(help_msg))
-# If the command argument is valid, check if file exists and open it
-elif not os.path.exists(sys.argv[2]):
-    print("\nFile or folder not found")
-else:
-    # Replace \ with / since Windows is compatible but not Linux or Mac
-    # Ex: TEST\TEST2\FILE.BIN or TEST\TEST2 == TEST/TEST2/FILE.BIN or TEST/TEST2
-    full_file_or_folder_name: str = sys.argv[2].replace("\\", "/")
-    # Get only the paths from the normalized path
-    # Ex: TEST/TEST2/FILE.BIN == TEST/TEST2/FILE
-    full_path_and_file_no_ext = os.path.splitext(full_file_or_folder_name)[0]
-    # Get only the file name from the normalized path
-    # Ex: TEST/TEST2/FILE.BIN == FILE.BIN
-    file_name_only = os.path.basename(full_file_or_folder_name)
-    # Full path to the index file
-    # Ex: TEST/TEST2/TEST2.BIN == TEST/TEST2/TEST2.txt
-    index_file_path = "{}/{}.txt".format(full_path_and_file_no_ext, file_name_only.replace(".BIN", ""))
-
+  -es  extracts che content of BIN file, keeping one copy of each file in the _STORE folder next to it.
+  -l   lists the content of BIN file without extracting it.
+  -i   inserts an extracted folder to BIN file.
+  -u   updates an existing BIN file in place with the changes of its extracted folder.
+  -v   verifies an extracted folder against its manifest and lists the changed files.
+  -w   watches an extracted folder (or ROCK_NEO.EXE) and updates its BIN file every time an edited file is saved.
+  -f   lists the runs of zeros of ROCK_NEO.EXE (or any file) that could hold text once checked to be unused.
+  -fa  adds a range of ROCK_NEO.EXE checked to be unused, given as START-END in hex, to hold the text that
+       doesn't fit. Ex: DashEditor.py -fa ROCK_NEO.EXE 493E0-4A380
+  -s   reports the files shared by the archives extracted to a _STORE folder.
+  -tm  indexes the MSG blocks of all the folders extracted in a folder and reports the ones used more than once.
+  -tp  copies the translation of each repeated MSG block to the places where it's still untranslated.\n
+  -be  extracts all the BIN files (and ROCK_NEO.EXE) in a folder or glob in parallel.
+  -bes same as -be, keeping one copy of each file in the _STORE folder next to the BIN files.
+  -bi  inserts all the extracted folders (and ROCK_NEO.EXE) in a folder or glob in parallel.
+       Only the ones with changed files are built again.
+  -bp  exports the TIM and FONT files of all the extracted folders in a folder or glob to indexed PNG in parallel.
+       The PNG files are inserted instead of the TIM files from then on.
+  -c   encodes the TXT files of all the extracted folders (and ROCK_NEO.EXE) in a folder or glob in parallel
+       without writing anything, and reports how much space is left in each MSG file and in the EXE.
+  -de  copies DAT/*.BIN and ROCK_NEO.EXE out of a disc image (ISO or raw BIN) and extracts them.
+  -di  inserts the folders extracted by -de like -bi and writes the changed files back into the disc image.\n""")
+
+commands = ("-e", "-es", "-l", "-i", "-u", "-v", "-w", "-f", "-fa", "-s", "-tm", "-tp")
+batch_commands = ("-be", "-bes", "-bi", "-bp", "-c", "-de", "-di")
+
+# Everything runs under the main guard, so the batch workers can import this file without running it again
+if __name__ == "__main__":
+    # Check if 2 arguments are passed (3 for batch commands with the amount of workers, and for -fa with the range)
+    if len(sys.argv) != 3 and not (len(sys.argv) == 4 and sys.argv[1] in batch_commands + ("-fa",)):
+        print("{}\nOne or more arguments missing or too many".format(help_msg))
+    # If they are, check if the command argument is valid
+    elif sys.argv[1] not in commands + batch_commands:
+        print("{}\nInvalid command!".format(help_msg))
+    # Batch commands accept globs, so they check for the files themselves
+    elif sys.argv[1] in batch_commands:
+        if len(sys.argv) == 4 and not sys.argv[3].isdigit():
+            print("\nThe amount of workers must be a number")
+        elif sys.argv[1] in ("-be", "-bes"):
+            do_batch_extract(sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else None, sys.argv[1] == "-bes")
+        elif sys.argv[1] == "-bi":
+            do_batch_insert(sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else None)
+        elif sys.argv[1] == "-bp":
+            do_batch_export_png(sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else None)
+        elif sys.argv[1] == "-c":
+            do_batch_check(sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else None)
+        elif not os.path.isfile(sys.argv[2]):
+            print("\nDisc image not found")
+        elif sys.argv[1] == "-de":
+            do_extract_image(sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else None)
+        elif sys.argv[1] == "-di":
+            do_insert_image(sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else None)
+    # If the command argument is valid, check if file exists and open it
+    elif not os.path.exists(sys.argv[2]):
+        print("\nFile or folder not found")
+    # If second argument is -l and third argument is file, list the BIN entries from their headers only
+    elif sys.argv[1] == "-l" and not os.path.isfile(sys.argv[2]):
+        print("\nExpected file. Provided folder")
+    elif sys.argv[1] == "-l" and os.path.isfile(sys.argv[2]):
+        do_list_file(sys.argv[2])
     # If second argument is -e and third argument is file
-    if sys.argv[1] == "-e" and not os.path.isfile(sys.argv[2]):
+    elif sys.argv[1] in ("-e", "-es") and not os.path.isfile(sys.argv[2]):
         print("\nExpected file. Provided folder")
-    elif sys.argv[1] == "-e" and os.path.isfile(sys.argv[2]):
-        file_data = open(full_file_or_folder_name, "rb").read()
-
-        if file_name_only == "ROCK_NEO.EXE":
-            try:
-                assert file_data[559296:559313].decode() == "BASLUS-00603-DASH"
-            except AssertionError:
-                print("\nNot a valid NTSC MML PSX EXE file")
-            else:
-                print("\nExtracting text block from {}".format(sys.argv[2].replace("\\", "/").split("/")[-1]))
-
-                # Read pointer table data
-                ptr_tbl_data = file_data[512716:513684]
-                # Pointer table size
-                ptr_tbl_size = len(ptr_tbl_data) // 4
-
-                print("Pointer table contains {} blocks".format(ptr_tbl_size))
-
-                output_file = open(full_path_and_file_no_ext + ".TXT", "w")
-
-                ptr_tbl_ofs = 0
-                block_number = 1  # Starting from one so it aligns with EXE_JUMP
-
-                while ptr_tbl_ofs < len(ptr_tbl_data):
-                    # Extract block data by subtracting 0x8000F800 since these are PSX memory offsets
-                    block_start_ofs = bytes_to_uint(ptr_tbl_data[ptr_tbl_ofs:ptr_tbl_ofs + 4]) - 2147547136
-                    # If we reached the last pointer, use the end of the block as end offset
-                    if ptr_tbl_ofs == len(ptr_tbl_data) - 4:
-                        block_end_ofs = 512716
-                    else:
-                        block_end_ofs = bytes_to_uint(ptr_tbl_data[ptr_tbl_ofs + 4:ptr_tbl_ofs + 8]) - 2147547136
-
-                    block_data = file_data[block_start_ofs:block_end_ofs]
-
-                    # Write each block with offset information
-                    output_file.write(
-                        "[Block {:02X}, String: {:04X}-{:04X}]\n".format(block_number, block_start_ofs, block_end_ofs)
-                    )
-
-                    output_file.write(do_decode_block(block_data) + "\n\n")
-
-                    ptr_tbl_ofs += 4
-                    block_number += 1
-
-                output_file.close()
-
-        else:
-            # Check if the file is a valid MML BIN file
-            try:
-                assert file_data[64:67].decode() == "..\\"
-            except AssertionError:
-                print("\nNot a valid MML PSX BIN file")
-            else:
-
-                # Create index file
-                if not os.path.exists(full_path_and_file_no_ext):
-                    os.mkdir(full_path_and_file_no_ext)
-
-                index_file = open(index_file_path, "w+")
-
-                # Proceed with extraction
-                do_unpack_bin(full_path_and_file_no_ext, file_data, index_file)
-
-                index_file.seek(0)
-                index_file_content = index_file.read().splitlines()
-                index_file_line = 0
-
-                while index_file_line < len(index_file_content):
-                    file_name = index_file_content[index_file_line].split(",")[0]
-                    file_path = index_file_path.replace(os.path.basename(index_file_path), "") + file_name
-                    # If MSG files are found, extract them
-                    if any(fn in index_file_content[index_file_line].upper() for fn in [".MSG"]):
-                        do_extract_msg(file_path)
-                        index_file_content = index_file_content.pop(0)
-                        index_file_line += 1
-                    # If TIM files are found, extract them
-                    elif any(fn in index_file_content[index_file_line].upper() for fn in [".TIM"]):
-                        do_extract_tim(file_path)
-                        index_file_line += 1
-                    # If FONT files are found, extract them
-                    elif any(fn in index_file_content[index_file_line].upper() for fn in ("FONT.DAT", "KAIFONT.DAT")):
-                        do_extract_font(file_path)
-                        index_file_line += 1
-                    else:
-                        index_file_line += 1
-
-                # Close the index file and return
-                index_file.close()
-
+    elif sys.argv[1] in ("-e", "-es") and os.path.isfile(sys.argv[2]):
+        do_extract_file(sys.argv[2], sys.argv[1] == "-es")
     # If arg1 is -i, and arg2 is ROCK_NEO.EXE, insert EXE text
-    elif sys.argv[1] == "-i" and file_name_only == "ROCK_NEO.EXE":
-        exe_file = open(full_file_or_folder_name, "rb+")
-
-        try:
-            exe_file.seek(559296)
-            assert exe_file.read(17).decode() == "BASLUS-00603-DASH"
-        except AssertionError:
-            print("\nNot a valid NTSC MML PSX EXE file")
-        else:
-            text_file = os.path.splitext(full_file_or_folder_name)[0] + ".TXT"
-            print("\nInserting {}".format(text_file))
-
-            # Read TXT file
-            text = open(text_file, "r").read()
-
-            ptr_table: list = [2148052808]  # 8008AF48 is the first pointer
-
-            i = 0
-            current_block = 1
-            encoded_block: list = []
-
-            while i < len(text):
-                # Skip the [Blocks] text but separate them for recalculating pointers
-                c = text[i]
-
-                if c == '[':
-                    # Find the end of the textual Block info and start of next
-                    block_end = text.find(']', i + 1)
-                    next_block_start = text.find('[', i + 1)
-
-                    # If there is no more blocks after, read until the end of the file
-                    if next_block_start == -1:
-                        text_block = text[block_end + 2:-2]
-                    # If there is another block after, read until the beginning of the next block
-                    else:
-                        # Remove the \n\n at beginning and end of block
-                        text_block = text[block_end + 2:next_block_start - 2]
-
-                    # Encode text block to list of bytes
-                    encoded_text_block = do_encode_text_block(text_block)
-                    encoded_block.append(encoded_text_block[0:-2])
-
-                    if current_block != 968 // 4:
-                        # Append the size of the encoded block to the pointer table
-                        ptr_table.append(ptr_table[-1] + len(encoded_text_block) - 2)
-                        current_block += 1
-
-                i += 1
-
-            # Convert pointer table int to sequence of bytes
-            ptr_table_bytes: bytes = b''
-            for items in ptr_table:
-                if not items == 968 // 4:
-                    ptr_table_bytes += (ulong_to_bytes(items))
-
-            # Convert list of lists of encoded blocks to bytes
-            encoded_block_bytes = bytes([val for sublist in encoded_block for val in sublist])
-            # print("Encoded text data size is {} bytes".format(len(encoded_block_bytes)))
-
-            if len(encoded_block_bytes) > 7044:
-                print("ERROR: New encoded data is {} bytes. Size limit is 7044 bytes.".format(len(encoded_block_bytes)))
-            else:
-                # Write pointer new pointer table
-                exe_file.seek(512716)
-                exe_file.write(ptr_table_bytes)
-                # Write encoded data
-                exe_file.seek(505672)
-                exe_file.write(encoded_block_bytes)
-
-            exe_file.close()
-
+    elif sys.argv[1] == "-i" and os.path.basename(sys.argv[2].replace("\\", "/")) == "ROCK_NEO.EXE":
+        do_insert_exe(sys.argv[2])
     # If argument is -i, and arg2 is FOLDER, pack BIN files
     elif sys.argv[1] == "-i" and not os.path.isdir(sys.argv[2]):
         print("\nExpected folder. Provided file")
     elif sys.argv[1] == "-i" and os.path.isdir(sys.argv[2]):
-
-        if not os.path.exists(index_file_path):
-            print("\nIndex file missing")
-        elif os.path.exists("{}.BIN".format(full_file_or_folder_name)):
-            print("\nBIN file already exists. Please delete or move/delete before creation.")
-        else:
-            index_file_content = open(index_file_path, "r").readlines()
-
-            index_file_line = 0
-
-            while index_file_line < len(index_file_content):
-                file_name = index_file_content[index_file_line].split(",")[0].upper()
-
-                # If any MSG file is found. Insert TXT into MSG
-                if any(fn in index_file_content[index_file_line].upper() for fn in [".MSG"]):
-                    original_msg = (index_file_path.replace(os.path.basename(index_file_path), "") + file_name)
-                    text_file = (index_file_path.replace(os.path.basename(index_file_path), "") + file_name + ".txt")
-                    if os.path.exists(original_msg) and os.path.exists(text_file):
-                        do_insert_msg(original_msg, text_file)
-                    index_file_line += 1
-                # If any TIM file is found. Insert TIM into original TIM
-                elif any(fn in index_file_content[index_file_line].upper() for fn in [".TIM"]):
-                    original_tim = (index_file_path.replace(os.path.basename(index_file_path), "") + file_name)
-                    edited_tim = (index_file_path.replace(os.path.basename(index_file_path), "")
-                                  + file_name.replace(".TIM", "_EXT.TIM"))
-                    if os.path.exists(original_tim) and os.path.exists(edited_tim):
-                        do_insert_tim(original_tim, edited_tim)
-                    index_file_line += 1
-                # If FONT file is found. Insert FONT into original FONT
-                elif any(fn in index_file_content[index_file_line].upper() for fn in ("FONT.DAT", "KAIFONT.DAT")):
-                    original_font = (index_file_path.replace(os.path.basename(index_file_path), "") + file_name)
-                    edited_font = (index_file_path.replace(os.path.basename(index_file_path), "")
-                                   + file_name.replace(".DAT", ".TIM"))
-                    if os.path.exists(original_font) and os.path.exists(edited_font):
-                        do_insert_font(original_font, edited_font)
-                    index_file_line += 1
-                # Else insert as is
-                else:
-                    index_file_line += 1
-
-            do_pack_bin(full_file_or_folder_name, index_file_content)
+        do_insert_folder(sys.argv[2])
+    # If argument is -u, and arg2 is FOLDER, patch the BIN next to it
+    elif sys.argv[1] == "-u" and not os.path.isdir(sys.argv[2]):
+        print("\nExpected folder. Provided file")
+    elif sys.argv[1] == "-u" and os.path.isdir(sys.argv[2]):
+        do_update_folder(sys.argv[2])
+    # If argument is -v, and arg2 is FOLDER, check it against the manifest
+    elif sys.argv[1] == "-v" and not os.path.isdir(sys.argv[2]):
+        print("\nExpected folder. Provided file")
+    elif sys.argv[1] == "-v" and os.path.isdir(sys.argv[2]):
+        do_verify_folder(sys.argv[2])
+    # If argument is -w, and arg2 is FOLDER or ROCK_NEO.EXE, keep updating its BIN or the EXE
+    elif sys.argv[1] == "-w" and not (os.path.isdir(sys.argv[2]) or
+                                      os.path.basename(sys.argv[2].replace("\\", "/")) == "ROCK_NEO.EXE"):
+        print("\nExpected folder or ROCK_NEO.EXE")
+    elif sys.argv[1] == "-w":
+        do_watch(sys.argv[2])
+    # If argument is -f, and arg2 is FILE, list its free space
+    elif sys.argv[1] == "-f" and not os.path.isfile(sys.argv[2]):
+        print("\nExpected file. Provided folder")
+    elif sys.argv[1] == "-f":
+        do_report_free_space(sys.argv[2])
+    # If argument is -fa, and arg2 is ROCK_NEO.EXE, add the range to its free ranges
+    elif sys.argv[1] == "-fa" and len(sys.argv) != 4:
+        print("\nExpected a range of ROCK_NEO.EXE. Ex: 493E0-4A380")
+    elif sys.argv[1] == "-fa" and os.path.basename(sys.argv[2].replace("\\", "/")) != "ROCK_NEO.EXE":
+        print("\nExpected ROCK_NEO.EXE")
+    elif sys.argv[1] == "-fa":
+        do_add_free_range(sys.argv[2], sys.argv[3])
+    # If argument is -s, and arg2 is the store FOLDER, report the shared files
+    elif sys.argv[1] == "-s" and not os.path.isdir(os.path.join(sys.argv[2], "refs")):
+        print("\nExpected a _STORE folder")
+    elif sys.argv[1] == "-s":
+        do_report_store(sys.argv[2])
+    # If argument is -tm or -tp, and arg2 is FOLDER, update its translation memory
+    elif sys.argv[1] in ("-tm", "-tp") and not os.path.isdir(sys.argv[2]):
+        print("\nExpected folder. Provided file")
+    elif sys.argv[1] == "-tm":
+        do_report_memory(sys.argv[2])
+    elif sys.argv[1] == "-tp":
+        do_propagate_memory(sys.argv[2])
@@ -1,7 +1,20 @@
 #!/usr/bin/env python3
 
+import hashlib
+import json
+import mmap
 import os
-import re
+import shutil
+from collections import namedtuple
+
+
+# One entry of a BIN archive as found by do_scan_bin.
+# name is the path stored in the header, path is the name after resolving duplicates,
+# disk_path is where the file is written inside the extraction folder and hash is the SHA-1 of the extracted file
+BinEntry = namedtuple("BinEntry", "offset type_code real_size aligned_size name path disk_path hash", defaults=(None,))
+
+# Version of the manifest written by do_unpack_bin. Change it whenever its fields change
+MANIFEST_VERSION = 1
 
 
 def bytes_to_uint(data):
@@ -19,36 +32,40 @@ def ulong_to_bytes(data):
     return four_bytes
 
 
-def do_unpack_bin(full_path_and_file_no_ext, f_data, index_file):
-    # Find all files inside the archive
-    occurrences = re.findall(b"\\x2E\\x2E\\x5C", f_data)
-    print("Found {} files. Extracting...\n".format(str(len(occurrences))))
+def do_map_file(file_path):
+    # Map the file read-only so the archive is paged in on demand instead of being read whole.
+    # mmap can't map empty files, so return an empty bytes object for those
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def do_scan_bin(f_data):
+    # Walk the 0x800 aligned headers once and build the table of entries without writing anything
+    f_data = memoryview(f_data)
 
     offset = 0
     padding = 2048  # 0x800
 
-    # Check if the amount of extracted files is correct
-    loop_counter = 0
+    entries: list = []
+    # Names already given out, so duplicates are resolved in memory instead of on disk
+    used_names: set = set()
 
     while offset < len(f_data):
 
-        if f_data[offset:offset + 4].startswith(b'\xFF\xFF\xFF\xFF'):
+        if f_data[offset:offset + 4] == b'\xFF\xFF\xFF\xFF':
             break
         else:
             # Check if if it starts with a ..\
-            if f_data[offset + 64:offset + 128].startswith(b"..\\"):
+            if f_data[offset + 64:offset + 67] == b"..\\":
 
                 # Get folders and filename and replace \ with / (Fix for Linux)
                 inner_folder_and_file: str = (
-                    f_data[offset + 67:offset + 128].replace(b'\x00', b'').decode().replace("\\", "/"))
+                    bytes(f_data[offset + 67:offset + 128]).replace(b'\x00', b'').decode().replace("\\", "/"))
 
-                # Get folders names
-                for folders in [inner_folder_and_file.split("/")]:
-                    # Skip all items that contains a dot (beginning and filename)
-                    full_path = full_path_and_file_no_ext + "/" + "/".join([x for x in folders if not "." in x])
-                    # Check if the folder has already been created. If not, create it
-                    if not os.path.exists(full_path):
-                        os.makedirs(full_path)
+                # Get folders names. Skip all items that contains a dot (beginning and filename)
+                inner_folder = "/".join([x for x in inner_folder_and_file.split("/") if "." not in x])
 
                 # Check file type for extraction
 
@@ -60,25 +77,26 @@ def do_unpack_bin(full_path_and_file_no_ext, f_data, index_file):
                 # SEP = 08              Sound file
                 # TIMCLUTOnly = 09      Also separate CLUT, but in an imageless TIM
                 # TIMCLUTPatch = 0A     Same header as TIM without FB coords and image size. Same Palette
+                type_code = bytes_to_uint(f_data[offset:offset + 4])
 
                 # Size = Width (0x24) * Height (0x28) * 2
                 # Regular TIM
-                if f_data[offset:offset + 4] == b'\x01\x00\x00\x00':  # TIM
+                if type_code == 0x01:  # TIM
                     tim_width = bytes_to_uint(f_data[offset + 36:offset + 40])
                     tim_height = bytes_to_uint(f_data[offset + 40:offset + 44])
                     file_len = tim_width * tim_height * 2
 
                 # CLT, Imageless TIM with CLUT only or Imageless TIM with CLUT Patch
                 # Size = Width (0x14) * Height (0x18) * 2
-                elif ((f_data[offset:offset + 4] == b'\x04\x00\x00\x00') or  # CLT
-                      (f_data[offset:offset + 4] == b'\x09\x00\x00\x00') or  # Imageless CLUT (in TIM format)
-                      (f_data[offset:offset + 4] == b'\x0A\x00\x00\x00')):  # Imagelesss CLUT Patch(in TIM format)
+                elif type_code in (0x04,  # CLT
+                                   0x09,  # Imageless CLUT (in TIM format)
+                                   0x0A):  # Imagelesss CLUT Patch(in TIM format)
                     clt_tim_width = bytes_to_uint(f_data[offset + 20:offset + 24])
                     clt_tim_height = bytes_to_uint(f_data[offset + 24:offset + 28])
                     file_len = clt_tim_width * clt_tim_height * 2
 
                 # FONT
-                elif f_data[offset:offset + 4] == b'\x03\x00\x00\x00':  # FONT
+                elif type_code == 0x03:  # FONT
                     file_len = bytes_to_uint(f_data[offset + 4:offset + 8]) + 1
 
                 # Anything else.
@@ -87,10 +105,10 @@ def do_unpack_bin(full_path_and_file_no_ext, f_data, index_file):
 
                     padded_fsize = ((file_len // padding) + 1) * padding
                     # This fixes files that already have an aligned size or that still have data in the middle
-                    if f_data[offset + file_len + 64:offset + file_len + 67].startswith(b"..\\"):
+                    if f_data[offset + file_len + 64:offset + file_len + 67] == b"..\\":
                         file_len = file_len - 1
-                    elif not (f_data[offset + padded_fsize + 64:offset + padded_fsize + 67].startswith(b"..\\") or
-                              f_data[offset + padded_fsize:offset + padded_fsize + 4].startswith(b"\xFF\xFF\xFF\xFF")):
+                    elif not (f_data[offset + padded_fsize + 64:offset + padded_fsize + 67] == b"..\\" or
+                              f_data[offset + padded_fsize:offset + padded_fsize + 4] == b"\xFF\xFF\xFF\xFF"):
                         file_len = file_len + padding
 
                 # Add the file length to the offset and align to 0x800. If it is already a multiple add 1
@@ -98,102 +116,493 @@ def do_unpack_bin(full_path_and_file_no_ext, f_data, index_file):
 
                 # Get file name and extension
                 inner_file_name = os.path.basename(inner_folder_and_file)
-                # inner_folder_and_file.split("/")[-1]
 
-                # Check if there are files with the same names (it happens). Add number to name and get ready for write
+                # Check if there are files with the same names (it happens). Add number to name
                 inner_file_name_only = inner_file_name.split(".")[0]
                 inner_file_name_extension = inner_file_name.split(".")[-1]
 
-                file_name_to_write = "{}/{}".format(full_path, inner_file_name)
-
-                if os.path.exists(file_name_to_write):
-                    existing_file_counter = 0
-                    while os.path.exists(file_name_to_write):
-                        file_name_to_write = "{}/{}_{}.{}".format(
-                            full_path, inner_file_name_only, str(existing_file_counter), inner_file_name_extension)
-                        inner_folder_and_file = "{}_{}.{}".format(
-                            inner_folder_and_file.split(".")[0], str(existing_file_counter), inner_file_name_extension)
-                        existing_file_counter += 1
-                inner_file = open(file_name_to_write, "wb")
+                renamed_folder_and_file = inner_folder_and_file
+                name_to_write = "{}/{}".format(inner_folder, inner_file_name)
 
-                print("Extracting {} to folder {}".format(inner_file_name, os.path.dirname(file_name_to_write)))
-                print("Real file size: {} byes - Aligned file size: {} bytes.".format(str(file_len), str(padded_fsize)))
+                existing_file_counter = 0
+                while name_to_write in used_names:
+                    name_to_write = "{}/{}_{}.{}".format(
+                        inner_folder, inner_file_name_only, str(existing_file_counter), inner_file_name_extension)
+                    renamed_folder_and_file = "{}_{}.{}".format(
+                        inner_folder_and_file.split(".")[0], str(existing_file_counter), inner_file_name_extension)
+                    existing_file_counter += 1
+                used_names.add(name_to_write)
 
-                # Write file
-                inner_file.write(f_data[offset:offset + padded_fsize])
-                inner_file.close()
-
-                # Write file info to index file for packing later
-                index_file.write(inner_folder_and_file + "," + str(padded_fsize) + "\n")
+                entries.append(BinEntry(
+                    offset, type_code, file_len, padded_fsize, inner_folder_and_file, renamed_folder_and_file,
+                    name_to_write))
 
                 # Set offset to the old offset + the size of the aligned files
                 offset = offset + padded_fsize
-                # Add 1 to the loop counter
-                loop_counter += 1
             else:
                 # If it does not start with ..\ just add padding to the offset
                 offset = offset + padding
 
-    if len(occurrences) == loop_counter:
-        print("\nThe amount of extracted files matches the occurrences.\n")
-    else:
-        print("\nSome files where not extracted successfully.\n")
+    f_data.release()
+
+    return entries
+
+
+class BinArchive:
+    # Read-only access to the entries of a BIN archive without extracting it.
+    # The file is only mapped when opened and the headers are only scanned on the first access to the entries.
+    # Ex: with BinArchive("DAT/ST00.BIN") as archive: text = archive.read_msg("ST00/M00.MSG")
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._data = None
+        self._entries = None
+        self._entries_by_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = do_map_file(self.file_path)
+        return self._data
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = do_scan_bin(self.data)
+            self._entries_by_path = {entry.path.upper(): entry for entry in self._entries}
+        return self._entries
+
+    def get_entry(self, path):
+        # Paths are the renamed ones used for extraction, compared without case. Ex: ST00/M00.MSG or ST00/DUP_1.DAT
+        self.entries
+        entry = self._entries_by_path.get(path.replace("\\", "/").upper())
+        if entry is None:
+            raise KeyError("{} not found in {}".format(path, self.file_path))
+        return entry
+
+    def read(self, path):
+        # The bytes of a single entry, header and padding included, exactly as -e writes them
+        entry = path if isinstance(path, BinEntry) else self.get_entry(path)
+        return self.data[entry.offset:entry.offset + entry.aligned_size]
+
+    def read_msg(self, path):
+        # Imported here, since the MSG, TIM and FONT modules import this one
+        from Formats.MSG import do_decode_msg
+        return do_decode_msg(self.read(path))
+
+    def iter_msg(self, path):
+        # Blocks of a MSG entry as (block_number, start, end, decoded_text), decoded as they are asked for
+        from Formats.MSG import do_iter_msg_blocks
+        return do_iter_msg_blocks(self.read(path))
+
+    def read_tim(self, path):
+        # The regular TIM that -e writes to _EXT.TIM, or None for the CLUT only types
+        from Formats.TIM import do_decode_tim
+        return do_decode_tim(self.read(path))
+
+    def read_font(self, path):
+        from Formats.FONT import do_decode_font
+        return do_decode_font(self.read(path))
 
 
-def do_pack_bin(full_file_or_folder_name, index_file_data):
+def do_list_bin(f_data):
+    entries = do_scan_bin(f_data)
 
-    # Initialize the needed variables
-    index_file_item: int = 0
+    print("\nFound {} files.\n".format(str(len(entries))))
+    print("{:>10}  {:>4}  {:>10}  {:>10}  {}".format("Offset", "Type", "Real size", "Aligned", "File"))
 
-    # Check if all files inside the index exists and are the correct size
+    for entry in entries:
+        print("{:>10X}  {:>4X}  {:>10}  {:>10}  {}".format(
+            entry.offset, entry.type_code, entry.real_size, entry.aligned_size, entry.path))
+
+    return entries
+
+
+def do_store_blob(store_folder, data, blob_hash):
+    # Keep a single copy of every unique file in the store, named after the hash of its contents
+    blob_path = "{}/objects/{}/{}".format(store_folder, blob_hash[:2], blob_hash[2:])
+
+    if not os.path.exists(blob_path):
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        # Write to a temporary file first, since other extractions may be storing the same file at the same time
+        temp_path = "{}.{}.tmp".format(blob_path, os.getpid())
+        with open(temp_path, "wb") as blob_file:
+            blob_file.write(data)
+        os.replace(temp_path, blob_path)
+
+    return blob_path
+
+
+def do_unshare_file(file_path):
+    # Files linked to the store are shared with other archives.
+    # Give them their own copy before changing them in place
+    if os.path.exists(file_path) and os.stat(file_path).st_nlink > 1:
+        temp_path = "{}.tmp".format(file_path)
+        shutil.copyfile(file_path, temp_path)
+        os.replace(temp_path, file_path)
+
+
+def do_get_manifest_path(index_file_path):
+    # The manifest sits where the old TXT index did, with its own extension
+    # Ex: TEST/TEST2/TEST2.txt == TEST/TEST2/TEST2.jsonl
+    return os.path.splitext(index_file_path)[0] + ".jsonl"
+
+
+def do_write_manifest(manifest_path, archive_name, entries):
+    # JSON Lines: a header with the version, then one entry per line in archive order
+    with open(manifest_path, "w") as manifest_file:
+        manifest_file.write(json.dumps({"version": MANIFEST_VERSION, "archive": archive_name}) + "\n")
+        manifest_file.write("".join(json.dumps(entry._asdict()) + "\n" for entry in entries))
+
+
+def do_read_index(index_file_path):
+    # Read the entries of an extracted folder from its manifest.
+    # Folders extracted by older versions only have the TXT index with path and aligned size
+    manifest_path = do_get_manifest_path(index_file_path)
+
+    if os.path.exists(manifest_path):
+        manifest_lines = open(manifest_path, "r").read().splitlines()
+        manifest_version = json.loads(manifest_lines[0]).get("version")
+        if manifest_version != MANIFEST_VERSION:
+            print("\nManifest version {} is not supported".format(manifest_version))
+            return None
+        return [BinEntry(**json.loads(line)) for line in manifest_lines[1:] if line]
+
+    elif os.path.exists(index_file_path):
+        entries: list = []
+        for index_file_line in open(index_file_path, "r").read().splitlines():
+            if index_file_line.strip():
+                path, aligned_size = index_file_line.split(",")[0:2]
+                entries.append(BinEntry(None, None, None, int(aligned_size), path, path, path))
+        return entries
+
+    return None
+
+
+def do_unpack_bin(full_path_and_file_no_ext, f_data, manifest_path, store_folder=None):
+    # Find all files inside the archive with a single pass over the headers
+    entries = do_scan_bin(f_data)
+    print("Found {} files. Extracting...\n".format(str(len(entries))))
+
+    # Work on a view of the data so entry writes don't copy the archive
+    f_data = memoryview(f_data)
+
+    # Files found in the store, as hash, size and path inside the archive
+    store_refs: list = []
+    # The entries with the hash of their contents, for the manifest
+    hashed_entries: list = []
+
+    for entry in entries:
+        file_name_to_write = "{}/{}".format(full_path_and_file_no_ext, entry.disk_path)
+        entry_data = f_data[entry.offset:entry.offset + entry.aligned_size]
+        entry = entry._replace(hash=hashlib.sha1(entry_data).hexdigest())
+        hashed_entries.append(entry)
+
+        # Check if the folder has already been created. If not, create it
+        full_path = os.path.dirname(file_name_to_write)
+        if not os.path.exists(full_path):
+            os.makedirs(full_path)
+
+        print("Extracting {} to folder {}".format(os.path.basename(entry.name), full_path))
+        print("Real file size: {} byes - Aligned file size: {} bytes.".format(
+            str(entry.real_size), str(entry.aligned_size)))
+
+        # Drop the link of a file extracted from the store before, so the shared copy isn't overwritten
+        if os.path.exists(file_name_to_write) and os.stat(file_name_to_write).st_nlink > 1:
+            os.remove(file_name_to_write)
+
+        linked = False
+        if store_folder is not None:
+            blob_path = do_store_blob(store_folder, entry_data, entry.hash)
+            store_refs.append("{},{},{}".format(entry.hash, entry.aligned_size, entry.path))
+            if os.path.exists(file_name_to_write):
+                os.remove(file_name_to_write)
+            # Hard links don't work on every file system. Write a regular copy then
+            try:
+                os.link(blob_path, file_name_to_write)
+                linked = True
+            except OSError:
+                pass
+
+        if not linked:
+            # Write file straight from the view of the archive
+            inner_file = open(file_name_to_write, "wb")
+            inner_file.write(entry_data)
+            inner_file.close()
+
+        entry_data.release()
+
+    f_data.release()
+
+    # Write the info of all the files to the manifest for packing later
+    do_write_manifest(manifest_path, os.path.basename(full_path_and_file_no_ext) + ".BIN", hashed_entries)
+
+    # Keep the list of files this archive uses from the store, to report which ones are shared
+    if store_folder is not None:
+        os.makedirs("{}/refs".format(store_folder), exist_ok=True)
+        with open("{}/refs/{}.txt".format(store_folder, os.path.basename(full_path_and_file_no_ext)), "w") as refs:
+            refs.write("".join(ref + "\n" for ref in store_refs))
+
+    print("\nExtracted {} files.\n".format(str(len(entries))))
+
+    return hashed_entries
+
+
+def do_report_store(store_folder):
+    # Group the files of every archive by their hash and list the ones used more than once
+    shared: dict = {}
+    refs_folder = "{}/refs".format(store_folder)
+
+    for refs_file in sorted(os.listdir(refs_folder)):
+        archive_name = os.path.splitext(refs_file)[0]
+        for ref in open("{}/{}".format(refs_folder, refs_file), "r").read().splitlines():
+            blob_hash, blob_size, inner_path = ref.split(",", 2)
+            shared.setdefault(blob_hash, [int(blob_size), []])[1].append("{}/{}".format(archive_name, inner_path))
+
+    total_files = sum(len(paths) for blob_size, paths in shared.values())
+    saved_bytes = 0
+
+    # Biggest savings first
+    for blob_hash, (blob_size, paths) in sorted(shared.items(), key=lambda item: -item[1][0] * len(item[1][1])):
+        if len(paths) < 2:
+            continue
+        saved_bytes += blob_size * (len(paths) - 1)
+        print("\n{} - {} bytes, used {} times:".format(blob_hash, blob_size, len(paths)))
+        for path in paths:
+            print("  {}".format(path))
+
+    print("\n{} files extracted, {} unique. {} bytes saved.".format(total_files, len(shared), saved_bytes))
+
+    return saved_bytes
+
+
+def do_copy_file_range(source_file, output_file, size, output_offset):
+    # Copy size bytes from the start of source_file to output_offset of output_file.
+    # Let the kernel copy the data when it can, and fall back to a fixed size buffer otherwise.
+    # Returns the amount of bytes copied, less than size if the source file is shorter
+    copied = 0
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                written = os.copy_file_range(source_file.fileno(), output_file.fileno(), size - copied,
+                                             copied, output_offset + copied)
+                if written == 0:
+                    break
+                copied += written
+        # Not supported by the kernel or the file system (or files on different devices)
+        except OSError:
+            pass
+
+    if copied < size and hasattr(os, "sendfile"):
+        try:
+            output_file.seek(output_offset + copied)
+            while copied < size:
+                written = os.sendfile(output_file.fileno(), source_file.fileno(), copied, size - copied)
+                if written == 0:
+                    break
+                copied += written
+        # sendfile only accepts sockets as output on some systems
+        except OSError:
+            pass
+
+    if copied < size:
+        buffer = memoryview(bytearray(1048576))
+        source_file.seek(copied)
+        output_file.seek(output_offset + copied)
+        while copied < size:
+            read = source_file.readinto(buffer[:min(len(buffer), size - copied)])
+            if not read:
+                break
+            # Unbuffered files may write only part of the buffer
+            written = 0
+            while written < read:
+                written += output_file.write(buffer[written:read])
+            copied += read
+
+    return copied
+
+
+def do_pack_bin(full_file_or_folder_name, entries, output_file_name=None):
+
+    # Check if all files inside the index exists and are the correct size.
+    # Each file is checked only once and its size kept for writing
     error = False
+    files_to_write: list = []
 
-    while index_file_item < len(index_file_data):
+    for entry in entries:
 
-        path_inner_file_to_write = (
-                full_file_or_folder_name + "/" + index_file_data[index_file_item].replace("\\n", "").split(",")[0])
-        file_to_write_index_len = index_file_data[index_file_item].replace("\\n", "").split(",")[1]
+        path_inner_file_to_write = full_file_or_folder_name + "/" + entry.path
+        file_to_write_index_len = entry.aligned_size
 
+        try:
+            file_to_write_size = os.stat(path_inner_file_to_write).st_size
         # If the path does not exist. ERROR
-        if not os.path.exists(path_inner_file_to_write):
+        except OSError:
             print("{} does not exists".format(path_inner_file_to_write))
-            index_file_item += 1
             error = True
+            continue
+
         # If the file sizes don't match. ERROR
-        elif os.path.getsize(path_inner_file_to_write) != int(file_to_write_index_len):
+        if file_to_write_size != file_to_write_index_len:
             print("{} has a size of {} instead of {} bytes".format(
-                path_inner_file_to_write, str(os.path.getsize(path_inner_file_to_write)), file_to_write_index_len))
-            index_file_item += 1
+                path_inner_file_to_write, str(file_to_write_size), file_to_write_index_len))
             error = True
         else:
-            index_file_item += 1
+            files_to_write.append((path_inner_file_to_write, file_to_write_size))
+
+    # The BIN is created next to the folder unless told otherwise
+    if output_file_name is None:
+        output_file_name = "{}.BIN".format(full_file_or_folder_name)
 
     # If all the tests pass,
     if not error:
-        print("Creating {}.BIN file...".format(full_file_or_folder_name))
-        output_bin = open("{}.BIN".format(full_file_or_folder_name), "ab")
+        print("Creating {} file...".format(output_file_name))
 
-        index_file_item = 0
-        end_file_size = 0
         padding = 2048  # 0x800
-
-        while index_file_item < len(index_file_data):
-            # Get file path and open it
-            path_inner_file_to_write = "{}/{}".format(
-                full_file_or_folder_name, index_file_data[index_file_item].replace("\\n", "").split(",")[0])
-            file_to_write = open(path_inner_file_to_write, "rb")
-            # Write the contents of opened file to destination BIN and close opened file
-            output_bin.write(file_to_write.read())
-            file_to_write.close()
-            # Add the written file size to a variable for use with padding calculations
-            end_file_size = end_file_size + os.path.getsize(path_inner_file_to_write)
-            index_file_item += 1
+        end_file_size = sum(file_to_write_size for path, file_to_write_size in files_to_write)
+        # The archive termination and its padding end the file on the next 0x800 boundary
+        bin_file_size = ((end_file_size // padding) + 1) * padding
+
+        # Unbuffered, since the data is copied straight between the file descriptors
+        output_bin = open(output_file_name, "wb", buffering=0)
+
+        # Reserve the final size up front. The reserved space reads as zeroes, so the end padding is already there
+        try:
+            os.posix_fallocate(output_bin.fileno(), 0, bin_file_size)
+        except (AttributeError, OSError):
+            output_bin.truncate(bin_file_size)
+
+        output_offset = 0
+
+        for path_inner_file_to_write, file_to_write_size in files_to_write:
+            # Copy the contents of the file to the destination BIN
+            with open(path_inner_file_to_write, "rb") as file_to_write:
+                copied = do_copy_file_range(file_to_write, output_bin, file_to_write_size, output_offset)
+            # The file got smaller while it was copied. The BIN would have a gap of zeros, so it's removed
+            if copied != file_to_write_size:
+                print("ERROR: Only {} of {} bytes of {} could be copied".format(copied, file_to_write_size,
+                                                                                path_inner_file_to_write))
+                output_bin.close()
+                os.remove(output_file_name)
+                return False
+            output_offset += file_to_write_size
 
         # Add Archive termination before padding
+        output_bin.seek(output_offset)
         output_bin.write(b'\xFF\xFF\xFF\xFF')
 
-        # Calculate end padding and write it
-        end_padding = (((end_file_size // padding) + 1) * padding) - end_file_size - 4
-        output_bin.write(end_padding * b'\x00')
-
         output_bin.close()
+
+    return not error
+
+
+def do_patch_bin(full_file_or_folder_name, entries, bin_file_name):
+    # Rewrite only the 0x800 sectors of the entries that changed inside an existing BIN.
+    # Returns the amount of patched bytes, or None if the layout of the BIN doesn't match the index
+    padding = 2048  # 0x800
+
+    files_to_patch: list = []
+    for entry in entries:
+        path_inner_file_to_write = full_file_or_folder_name + "/" + entry.path
+        file_to_write_index_len = entry.aligned_size
+
+        if not os.path.exists(path_inner_file_to_write):
+            print("{} does not exists".format(path_inner_file_to_write))
+            return None
+        elif os.stat(path_inner_file_to_write).st_size != file_to_write_index_len:
+            print("{} has a size of {} instead of {} bytes".format(
+                path_inner_file_to_write, os.stat(path_inner_file_to_write).st_size, file_to_write_index_len))
+            return None
+
+        files_to_patch.append(path_inner_file_to_write)
+
+    # Slots are taken from the index, since the headers of the inner files change when they are inserted.
+    # BIN files built by this tool have the slots one after the other. Original ones keep the offsets of the
+    # manifest, which can have sectors between the files. Old TXT indexes have no offsets
+    packed_offsets: list = []
+    offset = 0
+    for entry in entries:
+        packed_offsets.append(offset)
+        offset += entry.aligned_size
+    slot_offsets = [entry.offset for entry in entries]
+    layouts = [packed_offsets] if None in slot_offsets else [slot_offsets, packed_offsets]
+
+    with open(bin_file_name, "rb+") as bin_file:
+        bin_data = mmap.mmap(bin_file.fileno(), 0)
+
+        # The archive termination is right after the last slot of the layout of this BIN
+        for offsets in layouts:
+            end_offset = offsets[-1] + entries[-1].aligned_size if entries else 0
+            if bin_data[end_offset:end_offset + 4] == b'\xFF\xFF\xFF\xFF':
+                break
+        else:
+            print("{} doesn't match the index. Use -i to create it again.".format(bin_file_name))
+            bin_data.close()
+            return None
+
+        patched_bytes = 0
+        patched_files = 0
+
+        for path_inner_file_to_write, offset in zip(files_to_patch, offsets):
+            file_patched = False
+
+            with open(path_inner_file_to_write, "rb") as file_to_write:
+                for sector in iter(lambda: file_to_write.read(padding), b''):
+                    if bin_data[offset:offset + len(sector)] != sector:
+                        bin_data[offset:offset + len(sector)] = sector
+                        patched_bytes += len(sector)
+                        file_patched = True
+                    offset += len(sector)
+
+            if file_patched:
+                print("Patched {}".format(path_inner_file_to_write))
+                patched_files += 1
+
+        bin_data.flush()
+        bin_data.close()
+
+    print("Patched {} bytes in {} files".format(patched_bytes, patched_files))
+
+    return patched_bytes
+
+
+def do_verify_bin(full_file_or_folder_name, entries):
+    # Check the files of an extracted folder against its manifest without building anything
+    errors = 0
+    changed = 0
+
+    for entry in entries:
+        path_inner_file = full_file_or_folder_name + "/" + entry.path
+
+        if not os.path.exists(path_inner_file):
+            print("MISSING  {}".format(path_inner_file))
+            errors += 1
+        elif os.stat(path_inner_file).st_size != entry.aligned_size:
+            print("SIZE     {} has a size of {} instead of {} bytes".format(
+                path_inner_file, os.stat(path_inner_file).st_size, entry.aligned_size))
+            errors += 1
+        # Indexes from older versions have no hash to compare with
+        elif entry.hash is not None:
+            file_hash = hashlib.sha1()
+            with open(path_inner_file, "rb") as inner_file:
+                for chunk in iter(lambda: inner_file.read(1048576), b''):
+                    file_hash.update(chunk)
+            if file_hash.hexdigest() != entry.hash:
+                print("CHANGED  {}".format(path_inner_file))
+                changed += 1
+
+    print("\n{} files checked. {} changed since extraction, {} errors.".format(len(entries), changed, errors))
+
+    return errors == 0
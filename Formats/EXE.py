@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+
+import json
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from Formats.BIN import do_map_file
+from Formats.MSG import do_decode_block, do_encode_text_block, do_encode_cached_block, do_split_text_blocks
+from Formats.MSG import encode_errors
+
+# A text region of an executable. The pointer table is at ptr_tbl_start..ptr_tbl_end in the file, each pointer
+# ptr_size bytes long. Pointers are RAM addresses, ram_base being the address of the start of the file.
+# The text data of the blocks is at data_start..data_end. text_file is added to the name of the EXE without
+# extension to get the TXT file of the region. Ex: ROCK_NEO + .TXT
+ExeRegion = namedtuple("ExeRegion", "name ptr_tbl_start ptr_tbl_end ptr_size ram_base data_start data_end text_file")
+
+# A known executable, found by the serial at serial_offset, and its text regions.
+# free_ranges are (start, end) areas of the file known to be unused by the game. Blocks that don't fit in the data
+# of their region are placed there. Runs of zeros in an EXE are often data the game clears and uses at runtime,
+# so only ranges checked by hand can be listed. -f reports the candidates, and -fa adds a checked one to the
+# .free file next to a single EXE
+ExeLayout = namedtuple("ExeLayout", "name serial serial_offset regions free_ranges")
+
+exe_layouts = (
+    # Mega Man Legends NTSC-U
+    ExeLayout("ROCK_NEO.EXE", b"BASLUS-00603-DASH", 559296, (
+        ExeRegion("TEXT", 512716, 513684, 4, 0x8000F800, 505672, 512716, ".TXT"),
+    ), ()),
+)
+
+# Version of the allocation map and free ranges files. Change it whenever their fields change
+ALLOCATION_VERSION = 1
+
+ptr_formats = {2: "H", 4: "I"}
+
+
+def do_get_exe_layout(f_data):
+    # Find which known executable this is by its serial. Returns None for unknown ones
+    for exe_layout in exe_layouts:
+        serial_end = exe_layout.serial_offset + len(exe_layout.serial)
+        if f_data[exe_layout.serial_offset:serial_end] == exe_layout.serial:
+            return exe_layout
+    return None
+
+
+def do_get_exe_text_files(exe_file_path, full_path_and_file_no_ext):
+    # The TXT files of the regions of an EXE. Unknown or missing executables get the one of the first layout
+    regions = exe_layouts[0].regions
+    try:
+        f_data = do_map_file(exe_file_path)
+    except FileNotFoundError:
+        f_data = b''
+    exe_layout = do_get_exe_layout(f_data)
+    if exe_layout is not None:
+        regions = exe_layout.regions
+    if not isinstance(f_data, bytes):
+        f_data.close()
+    return [full_path_and_file_no_ext + region.text_file for region in regions]
+
+
+def do_read_region_pointers(f_data, region):
+    ptr_count = (region.ptr_tbl_end - region.ptr_tbl_start) // region.ptr_size
+    return struct.unpack_from("<{}{}".format(ptr_count, ptr_formats[region.ptr_size]), f_data, region.ptr_tbl_start)
+
+
+def do_find_free_runs(f_data, start, end, min_size=256, fill=0):
+    # Find the runs of at least min_size fill bytes between start and end, as (start, end) pairs.
+    # find looks for a whole run at a time, so only the bytes at the end of each run are checked
+    run_pattern = bytes((fill,)) * min_size
+    free_runs: list = []
+    offset = start
+
+    while True:
+        run_start = f_data.find(run_pattern, offset, end)
+        if run_start == -1:
+            return free_runs
+
+        run_end = run_start + min_size
+        while run_end < end:
+            chunk = bytes(f_data[run_end:min(run_end + 4096, end)])
+            rest = chunk.lstrip(bytes((fill,)))
+            run_end += len(chunk) - len(rest)
+            if rest:
+                break
+
+        free_runs.append((run_start, run_end))
+        offset = run_end
+
+
+def do_get_allocation_path(full_path_and_file_no_ext):
+    # Where each block of the regions was placed by the last insertion. Ex: ROCK_NEO.alloc
+    return full_path_and_file_no_ext + ".alloc"
+
+
+def do_read_allocation(full_path_and_file_no_ext):
+    allocation_path = do_get_allocation_path(full_path_and_file_no_ext)
+    if not os.path.exists(allocation_path):
+        return {}
+    try:
+        allocation = json.load(open(allocation_path, "r"))
+    except ValueError:
+        return {}
+    return allocation["regions"] if allocation.get("version") == ALLOCATION_VERSION else {}
+
+
+def do_get_free_ranges_path(full_path_and_file_no_ext):
+    # The free ranges checked by hand for this copy of the EXE. Ex: ROCK_NEO.free
+    return full_path_and_file_no_ext + ".free"
+
+
+def do_read_free_ranges(full_path_and_file_no_ext):
+    free_ranges_path = do_get_free_ranges_path(full_path_and_file_no_ext)
+    if not os.path.exists(free_ranges_path):
+        return []
+    try:
+        free_ranges = json.load(open(free_ranges_path, "r"))
+    except ValueError:
+        return []
+    if free_ranges.get("version") != ALLOCATION_VERSION:
+        return []
+    return [(range_start, range_end) for range_start, range_end in free_ranges["free_ranges"]]
+
+
+def do_get_free_ranges(exe_layout, full_path_and_file_no_ext):
+    # The free ranges of the layout plus the ones added with -fa, in file order
+    return sorted(set(exe_layout.free_ranges) | set(do_read_free_ranges(full_path_and_file_no_ext)))
+
+
+def do_iter_region_blocks(f_data, region, block_spans=None):
+    # Yield the number, start, end and text of each block of a region. Block numbers start from one
+    # so they align with EXE_JUMP. block_spans are the (start, end) of each block from the allocation map,
+    # used when the blocks can't be told apart by their pointers alone
+    ptr_table = do_read_region_pointers(f_data, region)
+    # Pointers are RAM addresses, so the address of the start of the file is subtracted to get offsets
+    block_starts = [pointer - region.ram_base for pointer in ptr_table]
+
+    if block_spans is not None and [block_start for block_start, block_end in block_spans] == block_starts:
+        block_ends = [block_end for block_start, block_end in block_spans]
+    else:
+        # The last block ends where the text data does
+        block_ends = block_starts[1:] + [region.data_end]
+
+    for block_num, (block_start, block_end) in enumerate(zip(block_starts, block_ends), 1):
+        yield block_num, block_start, block_end, do_decode_block(f_data[block_start:block_end])
+
+
+def do_encode_region_text(text, region, block_cache=None):
+    # Encode the TXT file of a region, one bytes object for each block that has a pointer
+    # Encode text blocks to bytes, without the 0x0000 at the end of each one
+    if block_cache is None:
+        encoded_block = [do_encode_text_block(text_block)[0:-2] for text_block in do_split_text_blocks(text)]
+    else:
+        encoded_block = [do_encode_cached_block(text_block, block_cache)[0:-2]
+                         for text_block in do_split_text_blocks(text)]
+
+    return encoded_block[:(region.ptr_tbl_end - region.ptr_tbl_start) // region.ptr_size]
+
+
+def do_allocate_region_blocks(encoded_block, region, free_areas):
+    # Place the blocks one after the other in the data of the region. The ones that don't fit go to the first of
+    # the free areas with room for them. free_areas are [start, used end, end] lists shared by every region,
+    # updated as blocks are placed. Returns the pointer table as bytes and the (start, end) of each block,
+    # or None if some block doesn't fit anywhere
+    areas = [[region.data_start, region.data_start, region.data_end]] + free_areas
+    block_spans: list = []
+
+    for encoded_text_block in encoded_block:
+        for area in areas:
+            if area[1] + len(encoded_text_block) <= area[2]:
+                block_spans.append((area[1], area[1] + len(encoded_text_block)))
+                area[1] += len(encoded_text_block)
+                break
+        else:
+            return None
+
+    ptr_table = [region.ram_base + block_start for block_start, block_end in block_spans]
+    # A table with room left ends with a pointer to the end of the data
+    if len(ptr_table) < (region.ptr_tbl_end - region.ptr_tbl_start) // region.ptr_size:
+        ptr_table.append(region.ram_base + areas[0][1])
+
+    ptr_table_bytes = struct.pack("<{}{}".format(len(ptr_table), ptr_formats[region.ptr_size]), *ptr_table)
+
+    return ptr_table_bytes, block_spans
+
+
+def do_extract_exe_text(exe_file_path, full_path_and_file_no_ext):
+    # Decode every text region of the EXE to its TXT file, reading the EXE only through one mapping
+    f_data = do_map_file(exe_file_path)
+    exe_layout = do_get_exe_layout(f_data)
+
+    if exe_layout is None:
+        print("\nNot a valid NTSC MML PSX EXE file")
+        if not isinstance(f_data, bytes):
+            f_data.close()
+        return None
+
+    # Blocks placed in the free areas by an insertion are found through its allocation map
+    allocation = do_read_allocation(full_path_and_file_no_ext)
+    block_count = 0
+
+    for region in exe_layout.regions:
+        print("\nExtracting {} text blocks from {}".format(region.name, exe_layout.name))
+        print("Pointer table contains {} blocks".format((region.ptr_tbl_end - region.ptr_tbl_start) //
+                                                        region.ptr_size))
+
+        with open(full_path_and_file_no_ext + region.text_file, "w") as output_file:
+            for block_num, block_start, block_end, block_text in do_iter_region_blocks(
+                    f_data, region, allocation.get(region.name)):
+                # Write each block with offset information
+                output_file.write("[Block {:02X}, String: {:04X}-{:04X}]\n{}\n\n".format(
+                    block_num, block_start, block_end, block_text))
+                block_count += 1
+
+    f_data.close()
+
+    return block_count
+
+
+def do_insert_exe_text(exe_file_path, full_path_and_file_no_ext, block_cache=None):
+    # Encode the TXT files of every text region and write them into the EXE.
+    # Nothing is written unless all of them fit
+    with open(exe_file_path, "rb+") as exe_file:
+        f_data = mmap.mmap(exe_file.fileno(), 0)
+
+    exe_layout = do_get_exe_layout(f_data)
+    if exe_layout is None:
+        print("\nNot a valid NTSC MML PSX EXE file")
+        f_data.close()
+        return None
+
+    free_areas = [[range_start, range_start, range_end]
+                  for range_start, range_end in do_get_free_ranges(exe_layout, full_path_and_file_no_ext)]
+    allocated_regions: list = []
+
+    for region in exe_layout.regions:
+        text_file = full_path_and_file_no_ext + region.text_file
+        print("\nInserting {}".format(text_file))
+
+        try:
+            encoded_block = do_encode_region_text(open(text_file, "r").read(), region, block_cache)
+        except encode_errors as e:
+            print("ERROR: {} can't be encoded: {}".format(text_file, e))
+            f_data.close()
+            return None
+
+        allocated_blocks = do_allocate_region_blocks(encoded_block, region, free_areas)
+
+        if allocated_blocks is None:
+            print("ERROR: New encoded data is {} bytes. Size limit is {} bytes{}.".format(
+                sum(len(encoded_text_block) for encoded_text_block in encoded_block),
+                region.data_end - region.data_start,
+                " plus {} free bytes".format(sum(area[2] - area[0] for area in free_areas)) if free_areas else ""))
+            f_data.close()
+            return None
+
+        allocated_regions.append((region, encoded_block) + allocated_blocks)
+
+    # The free areas only hold the blocks placed there by this insertion
+    for area_start, area_used_end, area_end in free_areas:
+        f_data[area_start:area_end] = bytes(area_end - area_start)
+        if area_used_end > area_start:
+            print("{} bytes placed in the free area at {:X}-{:X}".format(area_used_end - area_start, area_start,
+                                                                         area_end))
+
+    for region, encoded_block, ptr_table_bytes, block_spans in allocated_regions:
+        # Write the new pointer table, then the encoded blocks where they were placed
+        f_data[region.ptr_tbl_start:region.ptr_tbl_start + len(ptr_table_bytes)] = ptr_table_bytes
+        for encoded_text_block, (block_start, block_end) in zip(encoded_block, block_spans):
+            f_data[block_start:block_end] = encoded_text_block
+
+    f_data.flush()
+    f_data.close()
+
+    # Keep the allocation map only while some block is outside the data of its region
+    allocation_path = do_get_allocation_path(full_path_and_file_no_ext)
+    if any(area[1] > area[0] for area in free_areas):
+        json.dump({"version": ALLOCATION_VERSION,
+                   "regions": {region.name: block_spans for region, encoded_block, ptr_table_bytes, block_spans
+                               in allocated_regions}}, open(allocation_path, "w"))
+    elif os.path.exists(allocation_path):
+        os.remove(allocation_path)
+
+    return sum(len(encoded_block) for region, encoded_block, ptr_table_bytes, block_spans in allocated_regions)
+
+
+def do_report_free_space(file_path, min_size=256):
+    # List the runs of zeros of a file. For known executables the text regions are skipped, and the runs are
+    # listed with their RAM address so they can be checked before adding them with -fa
+    f_data = do_map_file(file_path)
+    exe_layout = do_get_exe_layout(f_data)
+
+    used_ranges = [(region.data_start, region.data_end) for region in exe_layout.regions] if exe_layout else []
+    free_ranges = do_get_free_ranges(exe_layout, os.path.splitext(file_path)[0]) if exe_layout else []
+    free_runs = [free_run for free_run in do_find_free_runs(f_data, 0, len(f_data), min_size)
+                 if not any(free_run[0] < used_end and used_start < free_run[1]
+                            for used_start, used_end in used_ranges)]
+
+    print("\n{} runs of at least {} zeros in {}\n".format(len(free_runs), min_size, os.path.basename(file_path)))
+    for run_start, run_end in free_runs:
+        if exe_layout is None:
+            print("{:08X}-{:08X}  {:>7} bytes".format(run_start, run_end, run_end - run_start))
+        else:
+            print("{:08X}-{:08X}  {:>7} bytes  RAM {:08X}{}".format(
+                run_start, run_end, run_end - run_start, exe_layout.regions[0].ram_base + run_start,
+                "  (free range)" if any(run_start < range_end and range_start < run_end
+                                        for range_start, range_end in free_ranges) else ""))
+
+    if not isinstance(f_data, bytes):
+        f_data.close()
+
+    return free_runs
+
+
+def do_add_free_range(file_path, range_text):
+    # Add a range checked by hand to be unused by the game, given as START-END file offsets in hex, to the .free
+    # file next to the EXE. It has to be inside the file, outside the text and the other free ranges, and all zeros
+    try:
+        range_start, range_end = [int(offset, 16) for offset in range_text.split("-")]
+    except ValueError:
+        print("\nExpected a range of file offsets in hex. Ex: 493E0-4A380")
+        return None
+
+    f_data = do_map_file(file_path)
+    exe_layout = do_get_exe_layout(f_data)
+    range_data = bytes(f_data[range_start:range_end])
+    file_size = len(f_data)
+    if not isinstance(f_data, bytes):
+        f_data.close()
+
+    if exe_layout is None:
+        print("\nNot a valid NTSC MML PSX EXE file")
+        return None
+
+    full_path_and_file_no_ext = os.path.splitext(file_path)[0]
+    free_ranges = do_get_free_ranges(exe_layout, full_path_and_file_no_ext)
+    used_ranges = [(exe_layout.serial_offset, exe_layout.serial_offset + len(exe_layout.serial))]
+    for region in exe_layout.regions:
+        used_ranges += [(region.ptr_tbl_start, region.ptr_tbl_end), (region.data_start, region.data_end)]
+
+    if not range_start < range_end <= file_size:
+        print("\nERROR: {:X}-{:X} is not a range inside the file".format(range_start, range_end))
+        return None
+    if any(range_start < used_end and used_start < range_end for used_start, used_end in used_ranges):
+        print("\nERROR: {:X}-{:X} overlaps the text of the EXE".format(range_start, range_end))
+        return None
+    if any(range_start < used_end and used_start < range_end for used_start, used_end in free_ranges):
+        print("\nERROR: {:X}-{:X} overlaps a free range".format(range_start, range_end))
+        return None
+    if range_data.count(0) != len(range_data):
+        print("\nERROR: {:X}-{:X} is not all zeros".format(range_start, range_end))
+        return None
+
+    free_ranges = sorted(do_read_free_ranges(full_path_and_file_no_ext) + [(range_start, range_end)])
+    json.dump({"version": ALLOCATION_VERSION, "free_ranges": free_ranges},
+              open(do_get_free_ranges_path(full_path_and_file_no_ext), "w"))
+
+    print("\nFree range {:X}-{:X} added, {} bytes".format(range_start, range_end, range_end - range_start))
+    print("{} free ranges saved to {}".format(len(free_ranges), do_get_free_ranges_path(full_path_and_file_no_ext)))
+
+    return free_ranges
@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
 
+import os
+
 from Formats.BIN import bytes_to_uint, ulong_to_bytes
+from Formats.PNG import png_signature
+from Formats.TIM import do_swizzle_blocks, do_write_tim_png, do_read_tim_png
 
 
 img_width = 256
 img_height = 512
-block_width = 128
-block_height = 32
+
+# Each byte of the FONT holds two 2bpp pixels of the top plane in bits 0-1 and 4-5, and two of the bottom one
+# in bits 2-3 and 6-7. These split them in two 4bpp bytes
+top_plane_table = bytes(px & 0x33 for px in range(256))
+bottom_plane_table = bytes((px >> 2) & 0x33 for px in range(256))
+
+# Palette = #000, #FFF, #BBB, #888
+font_clut = b'\x00\x00\xFF\xFF\xF7\xDE\xEF\xBD\x00\x00\x00\x00\x00\x00\x00\x00' \
+            b'\x00\x00\xFF\xFF\xF7\xDE\xEF\xBD\x00\x00\x00\x00\x00\x00\x00\x00'
 
 
 def do_insert_font(original_font, edited_font):
@@ -15,34 +26,37 @@ def do_insert_font(original_font, edited_font):
     original_font = open(original_font, "rb+")
     edited_font = open(edited_font, "rb").read()
 
-    pixel_data = edited_font[64:]
-
-    ord_pixel_data = [0] * 32768
-
-    offset = 0
-
-    for y in range(0, img_height // 2, block_height):
-        for x in range(0, img_width, block_width):
-            for by in range(0, block_height):
-                for bx in range(0, block_width, 2):
-                    px_top = pixel_data[((y + by) * (img_width // 2)) + ((x + bx) // 2)]
-                    px_top = px_top << 0
-                    px_bottom = pixel_data[32768 + (((y + by) * (img_width // 2)) + ((x + bx) // 2))]
-                    px_bottom = px_bottom << 2
-
-                    ord_pixel_data[offset] = px_top + px_bottom
-                    offset += 1
+    # PNG exported by do_export_font_png, or a TIM with a 64 bytes header
+    if edited_font[0:8] == png_signature:
+        pixel_data = do_read_tim_png(edited_font, 16, img_width // 2, img_height)
+        if pixel_data is None:
+            original_font.close()
+            return None
+    else:
+        pixel_data = edited_font[64:]
+    plane_size = (img_width // 2) * (img_height // 2)
+
+    if len(pixel_data) < plane_size * 2:
+        print("ERROR: Pixel data is {} bytes instead of {} bytes".format(len(pixel_data), plane_size * 2))
+        original_font.close()
+        return None
+
+    # Put both planes in block order, then back together in the same bytes
+    pixel_data_top = do_swizzle_blocks(pixel_data[0:plane_size], img_width // 2, img_height // 2, encode=True)
+    pixel_data_bottom = do_swizzle_blocks(pixel_data[plane_size:plane_size * 2], img_width // 2, img_height // 2,
+                                          encode=True)
+    ord_pixel_data = bytes(px_top + (px_bottom << 2) for px_top, px_bottom in zip(pixel_data_top, pixel_data_bottom))
 
     original_font.seek(2048)
-    original_font.write(bytearray(ord_pixel_data))
+    original_font.write(ord_pixel_data)
     original_font.close()
 
+    return len(ord_pixel_data)
 
-def do_extract_font(file_path):
-    print("Extracting {}".format(file_path))
-    # Open FONT file
-    font_file = open(file_path, "rb").read()
 
+def do_decode_font(font_file):
+    # Convert a FONT file (header included) to a 4bpp TIM with the two planes one above the other.
+    # Returns None if the FONT is incomplete
     # Create Header of TIM
     tim_tag = b'\x10\x00\x00\x00'
     tim_bpp = b'\x08\x00\x00\x00'
@@ -51,38 +65,54 @@ def do_extract_font(file_path):
     tim_fb_pal_y = b'\x00\x00'  # Not known but needed
     tim_colors = b'\x10\x00'
     tim_clut_num = b'\x01\x00'
-    # Palette = #000, #FFF, #BBB, #888
-    clut = b'\x00\x00\xFF\xFF\xF7\xDE\xEF\xBD\x00\x00\x00\x00\x00\x00\x00\x00' \
-           b'\x00\x00\xFF\xFF\xF7\xDE\xEF\xBD\x00\x00\x00\x00\x00\x00\x00\x00'
     tim_img_size = ulong_to_bytes((img_width // 4) * img_height * 2 + 12)
     tim_fb_img_x = b'\x00\x00'  # Not known but needed
     tim_fb_img_y = b'\x00\x00'  # Not known but needed
     tim_width = b'\x40\x00'
     tim_height = b'\x00\x02'
-    tim_pixel_data = font_file[2048:]
-
-    decoded_pixel_data_top = [0] * ((bytes_to_uint(tim_img_size) - 12) // 2)
-    decoded_pixel_data_bottom = [0] * ((bytes_to_uint(tim_img_size) - 12) // 2)
-    offset = 0
-
-    for y in range(0, img_height // 2, block_height):
-        for x in range(0, img_width, block_width):
-            for by in range(0, block_height):
-                for bx in range(0, block_width, 2):
-                    px = tim_pixel_data[offset]
-                    a = px & 0x03
-                    b = px & 0x30
-                    c = (px >> 2) & 0x03
-                    d = (px >> 2) & 0x30
-                    decoded_pixel_data_top[((y + by) * (img_width // 2)) + ((x + bx) // 2)] = b + a
-                    decoded_pixel_data_bottom[((y + by) * (img_width // 2)) + ((x + bx) // 2)] = d + c
-                    offset += 1
-
-    output_file = open(file_path.split(".")[0] + ".TIM", "wb")
-    output_file.write(
+    tim_pixel_data = bytes(font_file[2048:2048 + (bytes_to_uint(tim_img_size) - 12) // 2])
+
+    # Split each byte in the two planes, then put them in line order
+    decoded_pixel_data_top = do_swizzle_blocks(tim_pixel_data.translate(top_plane_table), img_width // 2,
+                                               img_height // 2)
+    decoded_pixel_data_bottom = do_swizzle_blocks(tim_pixel_data.translate(bottom_plane_table), img_width // 2,
+                                                  img_height // 2)
+    if decoded_pixel_data_top is None or decoded_pixel_data_bottom is None:
+        return None
+
+    return (
         tim_tag + tim_bpp + tim_clut_size + tim_fb_pal_x + tim_fb_pal_y + tim_colors + tim_clut_num +
-        clut + tim_img_size + tim_fb_img_x + tim_fb_img_y + tim_width + tim_height +
-        bytearray(decoded_pixel_data_top) + bytearray(decoded_pixel_data_bottom)
+        font_clut + tim_img_size + tim_fb_img_x + tim_fb_img_y + tim_width + tim_height +
+        decoded_pixel_data_top + decoded_pixel_data_bottom
     )
 
+
+def do_extract_font(file_path):
+    print("Extracting {}".format(file_path))
+    # Open FONT file
+    font_file = open(file_path, "rb").read()
+
+    decoded_font = do_decode_font(font_file)
+    if decoded_font is None:
+        return None
+
+    output_file = open(os.path.splitext(file_path)[0] + ".TIM", "wb")
+    output_file.write(decoded_font)
+    output_file.close()
+
     print("\nFound font. Extraction complete.")
+
+
+def do_export_font_png(file_path):
+    # Convert a FONT file straight to an indexed PNG, with the two planes one above the other like its TIM
+    print("Exporting {}".format(file_path))
+    font_file = open(file_path, "rb").read()
+
+    decoded_font = do_decode_font(font_file)
+    if decoded_font is None:
+        return None
+
+    png_path = os.path.splitext(file_path)[0] + ".PNG"
+    do_write_tim_png(png_path, decoded_font[64:], img_width // 2, img_height, 16, font_clut)
+
+    return png_path
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+import mmap
+from collections import namedtuple
+
+from Formats.BIN import bytes_to_uint
+
+
+# A file found in the ISO-9660 directory of a disc image.
+# lba is the first sector of its extent, size its size in bytes and record_lba/record_offset
+# where its directory record is, so the size can be updated when the file is written back
+ImageFile = namedtuple("ImageFile", "path lba size record_lba record_offset")
+
+# How the sectors of an image are stored: size of each sector on disk and where the 2048 bytes of data start in it
+SectorLayout = namedtuple("SectorLayout", "sector_size data_offset")
+
+sector_data_size = 2048  # 0x800
+sync_pattern = b'\x00' + b'\xFF' * 10 + b'\x00'
+
+# Lookup tables for the EDC (CRC with polynomial 0xD8018001) and the Reed-Solomon ECC of CD-ROM sectors
+ecc_f_lut = [0] * 256
+ecc_b_lut = [0] * 256
+edc_lut = [0] * 256
+for i in range(256):
+    j = (i << 1) ^ (0x11D if i & 0x80 else 0)
+    ecc_f_lut[i] = j
+    ecc_b_lut[i ^ j] = i
+    edc = i
+    for _ in range(8):
+        edc = (edc >> 1) ^ (0xD8018001 if edc & 1 else 0)
+    edc_lut[i] = edc
+
+
+def do_get_ecc_indexes(major_count, minor_count, major_mult, minor_inc):
+    # The bytes read for each P (columns) or Q (diagonals) parity byte, counted from the sector header
+    size = major_count * minor_count
+    ecc_indexes: list = []
+    for major in range(major_count):
+        index = (major >> 1) * major_mult + (major & 1)
+        major_indexes: list = []
+        for minor in range(minor_count):
+            major_indexes.append(index)
+            index += minor_inc
+            if index >= size:
+                index -= size
+        ecc_indexes.append(major_indexes)
+    return ecc_indexes
+
+
+ecc_p_indexes = do_get_ecc_indexes(86, 24, 2, 86)
+ecc_q_indexes = do_get_ecc_indexes(52, 43, 86, 88)
+
+
+def do_compute_edc(data):
+    edc = 0
+    for byte in data:
+        edc = (edc >> 8) ^ edc_lut[(edc ^ byte) & 0xFF]
+    return edc.to_bytes(4, byteorder="little")
+
+
+def do_compute_ecc_block(sector, ecc_indexes, output_offset):
+    # sector is the raw sector, indexes are counted from its header at 0x0C
+    major_count = len(ecc_indexes)
+    for major, major_indexes in enumerate(ecc_indexes):
+        ecc_a = 0
+        ecc_b = 0
+        for index in major_indexes:
+            temp = sector[12 + index]
+            ecc_a = ecc_f_lut[ecc_a ^ temp]
+            ecc_b ^= temp
+        ecc_a = ecc_b_lut[ecc_f_lut[ecc_a] ^ ecc_b]
+        sector[output_offset + major] = ecc_a
+        sector[output_offset + major + major_count] = ecc_a ^ ecc_b
+
+
+def do_encode_sector(sector):
+    # Compute again the EDC and ECC of a raw sector after its data changed
+
+    # Mode 1: EDC over sync, header and data, ECC over header and data
+    if sector[15] == 1:
+        sector[2064:2068] = do_compute_edc(sector[0:2064])
+        sector[2068:2076] = b'\x00' * 8
+        do_compute_ecc_block(sector, ecc_p_indexes, 2076)
+        do_compute_ecc_block(sector, ecc_q_indexes, 2248)
+
+    # Mode 2 Form 2 (XA audio and video): EDC only, no ECC
+    elif sector[18] & 0x20:
+        sector[2348:2352] = do_compute_edc(sector[16:2348])
+
+    # Mode 2 Form 1: EDC over subheader and data, ECC computed with the header set to zero
+    else:
+        sector[2072:2076] = do_compute_edc(sector[16:2072])
+        header = sector[12:16]
+        sector[12:16] = b'\x00' * 4
+        do_compute_ecc_block(sector, ecc_p_indexes, 2076)
+        do_compute_ecc_block(sector, ecc_q_indexes, 2248)
+        sector[12:16] = header
+
+
+def do_get_sector_layout(f_data):
+    # Raw images (BIN/IMG) start every 2352 bytes sector with the sync pattern, ISO files only have the data
+    if f_data[0:12] == sync_pattern:
+        return SectorLayout(2352, 16 if f_data[15] == 1 else 24)
+    return SectorLayout(sector_data_size, 0)
+
+
+def do_read_sectors(f_data, layout, lba, size):
+    # Put together the data of consecutive sectors, skipping the headers and EDC/ECC of raw images
+    if layout.data_offset == 0:
+        return f_data[lba * sector_data_size:lba * sector_data_size + size]
+
+    data = bytearray()
+    sector_offset = lba * layout.sector_size + layout.data_offset
+    while len(data) < size:
+        data += f_data[sector_offset:sector_offset + min(sector_data_size, size - len(data))]
+        sector_offset += layout.sector_size
+    return bytes(data)
+
+
+def do_write_sectors(f_data, layout, lba, data):
+    # Write data over consecutive sectors, only touching the ones that changed.
+    # Returns the number of sectors written
+    written = 0
+
+    for data_offset in range(0, len(data), sector_data_size):
+        sector_offset = (lba + data_offset // sector_data_size) * layout.sector_size
+        new_data = data[data_offset:data_offset + sector_data_size]
+        old_data = f_data[sector_offset + layout.data_offset:sector_offset + layout.data_offset + len(new_data)]
+
+        if new_data == old_data:
+            continue
+
+        sector = bytearray(f_data[sector_offset:sector_offset + layout.sector_size])
+        sector[layout.data_offset:layout.data_offset + len(new_data)] = new_data
+        if layout.data_offset != 0:
+            do_encode_sector(sector)
+        f_data[sector_offset:sector_offset + layout.sector_size] = sector
+        written += 1
+
+    return written
+
+
+def do_read_directory(f_data, layout, lba, size, folder, files):
+    directory_data = do_read_sectors(f_data, layout, lba, size)
+    offset = 0
+
+    while offset < len(directory_data):
+        record_length = directory_data[offset]
+
+        # Records never cross sectors, the rest of a sector is padded with zeros
+        if record_length == 0:
+            offset = (offset // sector_data_size + 1) * sector_data_size
+            continue
+
+        record = directory_data[offset:offset + record_length]
+        name_length = record[32]
+        name = record[33:33 + name_length]
+
+        # Skip the . and .. records
+        if name not in (b'\x00', b'\x01'):
+            # Remove the version and the dot of names without extension. Ex: ROCK_NEO.EXE;1 == ROCK_NEO.EXE
+            name = name.decode().split(";")[0].rstrip(".")
+            path = folder + name
+            extent_lba = bytes_to_uint(record[2:6])
+            extent_size = bytes_to_uint(record[10:14])
+
+            if record[25] & 0x02:
+                do_read_directory(f_data, layout, extent_lba, extent_size, path + "/", files)
+            else:
+                files[path.upper()] = ImageFile(path, extent_lba, extent_size,
+                                                lba + offset // sector_data_size, offset % sector_data_size)
+
+        offset += record_length
+
+    return files
+
+
+def do_scan_image(f_data):
+    # Walk the ISO-9660 directory from the Primary Volume Descriptor in sector 16.
+    # Returns the sector layout and the files found, by their upper case path. Ex: DAT/ST00.BIN
+    layout = do_get_sector_layout(f_data)
+
+    volume_descriptor = do_read_sectors(f_data, layout, 16, sector_data_size)
+    if volume_descriptor[0:6] != b'\x01CD001':
+        return layout, None
+
+    root_record = volume_descriptor[156:190]
+    files = do_read_directory(f_data, layout, bytes_to_uint(root_record[2:6]), bytes_to_uint(root_record[10:14]),
+                              "", {})
+
+    return layout, files
+
+
+def do_map_image(file_path, write=False):
+    with open(file_path, "rb+" if write else "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if write else mmap.ACCESS_READ)
+
+
+def do_write_image_file(f_data, layout, image_file, data):
+    # Write a file back over its extent. The file can't use more sectors than the original one did,
+    # since the sectors after it belong to other files. Returns the number of sectors written or None
+    extent_sectors = (image_file.size + sector_data_size - 1) // sector_data_size
+    if (len(data) + sector_data_size - 1) // sector_data_size > extent_sectors:
+        print("\n{} is {} bytes and doesn't fit in its {} bytes extent".format(
+            image_file.path, len(data), extent_sectors * sector_data_size))
+        return None
+
+    written = do_write_sectors(f_data, layout, image_file.lba, data)
+
+    # Update the size in the directory record, stored both little and big endian
+    if len(data) != image_file.size:
+        directory_sector = bytearray(do_read_sectors(f_data, layout, image_file.record_lba, sector_data_size))
+        directory_sector[image_file.record_offset + 10:image_file.record_offset + 14] = \
+            len(data).to_bytes(4, byteorder="little")
+        directory_sector[image_file.record_offset + 14:image_file.record_offset + 18] = \
+            len(data).to_bytes(4, byteorder="big")
+        written += do_write_sectors(f_data, layout, image_file.record_lba, directory_sector)
+
+    return written
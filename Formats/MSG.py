@@ -1,12 +1,29 @@
 #!/usr/bin/env python3
 
+import bisect
+import hashlib
+import json
 import re
 import os
+import struct
+import time
+from collections import namedtuple
+from functools import lru_cache
 
-from Formats.BIN import bytes_to_uint, uint_to_bytes, ulong_to_bytes
+from Formats.BIN import bytes_to_uint, ulong_to_bytes, do_map_file
 
 header = 2048  # 0x800
 
+# Version of the bytes written for the text. Change it whenever the encoder output changes for some text,
+# so the encoded blocks cached by older versions are thrown away
+MSG_CODEC_VERSION = 1
+# Blocks not used for this many days, and the least recently used ones above the size limit, are dropped
+BLOCK_CACHE_MAX_AGE = 30
+BLOCK_CACHE_MAX_BLOCKS = 65536
+
+# Raised by the encoder for text it can't read, like a mistyped tag
+encode_errors = (AttributeError, IndexError, KeyError, ValueError)
+
 char_table = {
     # FONT TABLE
     # Numbers
@@ -38,284 +55,294 @@ char_table = {
     0x86: '\n'
 }
 
+# Runs of bytes found in char_table. Once decoded as latin-1 (one char per byte) they convert with str.translate
+glyph_run_pattern = re.compile(b"[" + b"".join(b"\\x%02X" % code for code in sorted(char_table)) + b"]+")
+
+# The reverse of char_table for the encoder. Single characters are converted in runs with str.translate,
+# the ones written as tags are looked up by the name inside the brackets. Ex: <DOT> == DOT
+glyph_encoding = {ord(char): code for code, char in char_table.items() if len(char) == 1}
+glyph_tags = {char[1:-1]: code for code, char in char_table.items() if len(char) > 1}
+
+# A text block is a sequence of tags and runs of characters from char_table
+text_token_pattern = re.compile("<([^>]*)>|([{}]+)".format(re.escape("".join(map(chr, glyph_encoding)))))
+# The line before each block of a TXT file. Ex: [Block 00, String: 0802-0810]
+block_header_pattern = re.compile(r"\[[^\]]*\]")
+s_arg_pattern = re.compile(r"\s([^\W]*)")
+m_arg_pattern = re.compile(r"=([^\W]*)")
+
+
+# Control codes of MSG files, as code, name, layout and size of the arguments and newlines written after the tag.
+# The layouts are:
+# ""    no arguments. Ex: <END> == A9
+# "LE"  one hex argument of size bytes, stored little endian. Ex: <CLOSE 0102> == 84 02 01
+# "BE"  one hex argument of size bytes, stored in the same order. Ex: <CALL 0102> == 99 01 02
+# "M"   named arguments, with size listing their names and sizes. Words are stored little endian
+#       Ex: <IF A=0102 JMP=03> == B9 02 01 03
+# "SEL" same as M, followed by one more byte for each SEL tag found before in the block
+MsgOpcode = namedtuple("MsgOpcode", "code name layout size newlines arg_len")
+
+
+def do_make_opcode(code, name, layout, size, newlines):
+    # arg_len is the size in bytes of the fixed arguments
+    arg_len = sum(arg_size for arg_name, arg_size in size) if layout in ("M", "SEL") else size
+    return MsgOpcode(code, name, layout, size, newlines, arg_len)
+
+
+msg_opcodes = {op[0]: do_make_opcode(*op) for op in (
+    (0x84, "CLOSE", "LE", 2, 1),
+    (0x87, "CLEAR", "LE", 2, 1),  # 0000 Closes the window. 0004 Clears the text.
+    (0x89, "COLOR", "LE", 1, 0),  # 00 = White, 01 = Green?, 02 = Red, 04 = Blue, 05 = Purple
+    (0x8A, "UNK_8A", "LE", 2, 0),  # TODO: Verify in game. Looks like a wrapper for something.
+    (0x8B, "PAUSE", "LE", 2, 0),
+    (0x8C, "WIN", "M", (("PX", 2), ("PY", 2), ("SX", 1), ("SY", 1)), 1),
+    (0x8D, "UNK_8D", "LE", 1, 0),  # TODO: Verify in game
+    (0x8E, "UNK_8E", "LE", 2, 0),  # TODO: Verify in game
+    (0x8F, "AUDIO", "LE", 4, 1),
+    # WT 0=Normal, 1=Dim Full Screen, 2=Lighter, 4/8=No Color | BORDER=Padding of all sides
+    (0x93, "DECOR", "M", (("WT", 1), ("PAD", 1)), 1),
+    (0x94, "MOVE_FREE", "", 0, 0),
+    (0x96, "SEL", "LE", 2, 0),  # Probably b2 and b3 are used for positioning. b4 no idea. Needs testing
+    (0x97, "MULTI", "SEL", (("T", 1),), 0),
+    (0x99, "CALL", "BE", 2, 0),
+    (0x9A, "GET", "LE", 2, 0),
+    (0x9B, "GIVE", "LE", 2, 0),  # Something item related
+    (0x9C, "MSG_IF", "M", (("1", 1), ("2", 1), ("3", 1), ("4", 1)), 1),  # Calls a dialog if it hasn't been used yet
+    (0x9F, "NEXT", "", 0, 2),
+    (0xA0, "PAD", "LE", 2, 0),
+    (0xA1, "AUTO", "", 0, 0),  # Window type? Not 100% sure
+    (0xA2, "MANUAL", "", 0, 0),  # Window type? Not 100% sure
+    (0xA4, "WAIT", "LE", 2, 1),
+    # V=Character Visibility, Z=Axis (Zoom), X=X Axis (Rotation), P=Pitch, Y=Axis
+    (0xA5, "CAM", "M", (("V", 2), ("Z", 2), ("X", 2), ("P", 2), ("Y", 2)), 1),
+    (0xA6, "UNK_A6", "LE", 2, 1),  # TODO: Verify in game
+    (0xA7, "UNK_A7", "BE", 8, 0),  # TODO: Verify in game. Possible camera animation.
+    (0xA9, "END", "", 0, 0),  # TODO: Verify in game
+    (0xAC, "EXE_JUMP", "LE", 2, 0),  # Weird cases.
+    (0xAD, "UNK_AD", "BE", 6, 0),  # Similar to 0x96 but apparently able to move the cursor with multiple options
+    (0xAE, "OPTION", "LE", 2, 0),
+    (0xAF, "UNK_AF", "LE", 1, 1),  # TODO: Verify in game
+    (0xB2, "RESTORE_HP", "", 0, 0),
+    (0xB3, "RESTORE_SP", "", 0, 0),
+    (0xB4, "RESTORE_SHIELD", "", 0, 0),
+    (0xB9, "IF", "M", (("A", 2), ("JMP", 1)), 0),
+    (0xBA, "COST", "", 0, 0),
+    (0xBF, "JUMP", "BE", 2, 0),
+    (0xC8, "ZENNY_AMOUNT", "", 0, 0),
+    (0xD0, "ITEM", "LE", 1, 0),
+    (0xD1, "UNK_D1", "LE", 2, 0),  # Some kind of variable
+    (0xD3, "PRICE_ZENNY", "", 0, 0),
+    (0xD4, "UNK_D4", "LE", 1, 0),  # Some kind of variable
+    (0xD6, "UNK_D6", "LE", 2, 0),  # TODO: Verify in game
+    (0xD7, "UNK_D7", "LE", 4, 0),  # TODO: Verify in game
+    (0xDA, "UNK_DA", "BE", 2, 0),  # TODO: Verify in game. Menu stuff. Some kind of inventory variable
+    (0xDB, "UNK_DB", "BE", 4, 0),  # TODO: Verify in game
+    (0xDD, "UNK_DD", "BE", 4, 0),  # TODO: Verify in game
+    (0xE1, "UNK_E1", "BE", 2, 0),  # TODO: Verify in game. Menu stuff. Some kind of inventory variable
+    (0xE3, "UNK_E3", "BE", 2, 0),  # TODO: Verify in game
+)}
+
+# Same table by name, for the encoder
+msg_opcodes_by_name = {opcode.name: opcode for opcode in msg_opcodes.values()}
+
 
 def tag_args(full_tag: str, typ: str) -> list:
-    i = 0
     tag_arguments: list = []
     if typ == "S":
-        tag_arguments = re.findall(r"\s([^\W]*)", full_tag)
-        tag_arguments = re.findall(r'.{1,2}', tag_arguments[i])
+        # A single hex argument, split in bytes. Ex: CLOSE 0102 == ["01", "02"]
+        tag_argument = s_arg_pattern.search(full_tag).group(1)
+        tag_arguments = [tag_argument[i:i + 2] for i in range(0, len(tag_argument), 2)]
     elif typ == "M":
-        tag_arguments = re.findall(r"=([^\W]*)", full_tag)
+        tag_arguments = m_arg_pattern.findall(full_tag)
     return tag_arguments
 
 
-def do_encode_text_block(text_block):
-    # Invert character table Dictionary
-    inverse_char_table = {v: k for k, v in char_table.items()}
+def do_encode_tag_args(opcode, tag):
+    # Convert the arguments of a control code tag to bytes, following its layout in msg_opcodes
+    if opcode.layout == "LE":
+        return [int(arg, 16) for arg in reversed(tag_args(tag, typ="S")[:opcode.size])]
+
+    elif opcode.layout == "BE":
+        return [int(arg, 16) for arg in tag_args(tag, typ="S")[:opcode.size]]
+
+    elif opcode.layout in ("M", "SEL"):
+        arg_bytes: list = []
+        for arg_num, arg in enumerate(tag_args(tag, typ="M")):
+            # The arguments after the named ones (one per SEL tag for MULTI) are single bytes
+            arg_size = opcode.size[arg_num][1] if arg_num < len(opcode.size) else 1
+            if arg_size == 2:
+                arg_bytes.extend((int(arg, 16) & 0xFF, int(arg, 16) >> 8))
+            else:
+                arg_bytes.append(int(arg, 16))
+        return arg_bytes
+
+    return []
+
+
+@lru_cache(maxsize=4096)
+def do_encode_tag(tag):
+    # Convert a tag to bytes, and the amount of newlines written after it by the decoder.
+    # The same tags are used over and over, so each one is only converted once
+    # Check which tag and convert
+    if tag in glyph_tags:
+        return bytes((glyph_tags[tag],)), 0
+
+    # Control codes are found by the name before the arguments. Ex: CLOSE 0000 == CLOSE
+    opcode = msg_opcodes_by_name.get(tag.split(" ", 1)[0])
+    if opcode is not None:
+        return bytes([opcode.code] + do_encode_tag_args(opcode, tag)), opcode.newlines
+
+    # Unknown control codes are written as their hex value. Ex: <85>
+    return bytes((int(tag, 16),)), 0
+
 
-    output = []
+def do_encode_text_block(text_block):
+    output = bytearray()
     bi = 0
 
     # Analyze block and convert
     while bi < len(text_block):
-        c = text_block[bi]
-        # If char is not < then read from table and write to output
-        if c != '<':
-            output.append(inverse_char_table[c])
-            bi += 1
-            continue
+        token = text_token_pattern.match(text_block, bi)
+        # Only characters missing from char_table don't match
+        if token is None:
+            raise KeyError(text_block[bi])
 
-        # If char is < read until > is found and define the tag for conversion
-        tag_end = text_block.find('>', bi + 1)
-        tag = text_block[bi + 1:tag_end]
-
-        ai = 0
-
-        # Check which tag and convert
-        if "<{}>".format(tag) in inverse_char_table:
-            output.append(inverse_char_table["<{}>".format(tag)])
-
-        elif tag.startswith('CLOSE'):
-            output.append(0x84)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('CLEAR'):
-            output.append(0x87)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('COLOR'):
-            output.append(0x89)
-            output.append(int(tag_args(tag, typ="S")[0], 16))
-
-        elif tag.startswith('UNK_8A'):
-            output.append(0x8A)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('PAUSE'):
-            output.append(0x8B)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('WIN'):
-            output.append(0x8C)
-            for arg in tag_args(tag, typ="M"):
-                if len(arg) == 4:
-                    output.extend((int(arg, 16) & 0xFF, int(arg, 16) >> 8))
-                elif len(arg) == 2:
-                    output.append(int(arg[ai:], 16))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('UNK_8D'):
-            output.append(0x8D)
-            output.append(int(tag_args(tag, typ="S")[0], 16))
-
-        elif tag.startswith('UNK_8E'):
-            output.append(0x8E)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('AUDIO'):
-            output.append(0x8F)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('DECOR'):
-            output.append(0x93)
-            for arg in tag_args(tag, typ="M"):
-                output.append(int(arg[ai:], 16))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('MOVE_FREE'):
-            output.append(0x94)
-
-        elif tag.startswith('SEL'):
-            output.append(0x96)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('MULTI'):
-            output.append(0x97)
-            for arg in tag_args(tag, typ="M"):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('CALL'):
-            output.append(0x99)
-            for arg in tag_args(tag, typ="S"):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('GET'):
-            output.append(0x9A)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('GIVE'):
-            output.append(0x9B)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('MSG_IF'):
-            output.append(0x9C)
-            for arg in tag_args(tag, typ="M"):
-                output.append(int(arg[ai:], 16))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('NEXT'):
-            output.append(0x9F)
-            bi += 2  # Account for the extra \n\n
-
-        elif tag.startswith('PAD'):
-            output.append(0xA0)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('AUTO'):
-            output.append(0xA1)
-
-        elif tag.startswith('MANUAL'):
-            output.append(0xA2)
-
-        elif tag.startswith('WAIT'):
-            output.append(0xA4)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('CAM'):
-            output.append(0xA5)
-            for arg in tag_args(tag, typ="M"):
-                output.extend((int(arg, 16) & 0xFF, int(arg, 16) >> 8))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('UNK_A6'):
-            output.append(0xA6)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('UNK_A7'):
-            output.append(0xA7)
-            for arg in tag_args(tag, typ="S"):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('END'):
-            output.append(0xA9)
-
-        elif tag.startswith('EXE_JUMP'):
-            output.append(0xAC)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('OPTION'):
-            output.append(0xAE)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('UNK_AD'):
-            output.append(0xAD)
-            for arg in tag_args(tag, typ="S"):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('UNK_AF'):
-            output.append(0xAF)
-            output.append(int(tag_args(tag, typ="S")[0], 16))
-            bi += 1  # Account for the extra \n
-
-        elif tag.startswith('RESTORE_HP'):
-            output.append(0xB2)
-
-        elif tag.startswith('RESTORE_SP'):
-            output.append(0xB3)
-
-        elif tag.startswith('RESTORE_SHIELD'):
-            output.append(0xB4)
-
-        elif tag.startswith('IF'):
-            output.append(0xB9)
-            for arg in tag_args(tag, typ="M"):
-                if len(arg) == 4:
-                    output.extend((int(arg, 16) & 0xFF, int(arg, 16) >> 8))
-                elif len(arg) == 2:
-                    output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('COST'):
-            output.append(0xBA)
-
-        elif tag.startswith('JUMP'):
-            output.append(0xBF)
-            for arg in tag_args(tag, typ="S"):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('ZENNY_AMOUNT'):
-            output.append(0xC8)
-
-        elif tag.startswith('ITEM'):
-            output.append(0xD0)
-            output.append(int(tag_args(tag, typ="S")[0], 16))
-
-        elif tag.startswith('UNK_D1'):
-            output.append(0xD1)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('PRICE_ZENNY'):
-            output.append(0xD3)
-
-        elif tag.startswith('UNK_D4'):
-            output.append(0xD4)
-            output.append(int(tag_args(tag, typ="S")[0], 16))
-
-        elif tag.startswith('UNK_D6'):
-            output.append(0xD6)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('UNK_D7'):
-            output.append(0xD7)
-            for arg in reversed(tag_args(tag, typ="S")):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('UNK_DA'):
-            output.append(0xDA)
-            for arg in tag_args(tag, typ="S"):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('UNK_DB'):
-            output.append(0xDB)
-            for arg in tag_args(tag, typ="S"):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('UNK_DD'):
-            output.append(0xDD)
-            for arg in tag_args(tag, typ="S"):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('UNK_E1'):
-            output.append(0xE1)
-            for arg in tag_args(tag, typ="S"):
-                output.append(int(arg[ai:], 16))
-
-        elif tag.startswith('UNK_E3'):
-            output.append(0xE3)
-            for arg in tag_args(tag, typ="S"):
-                output.append(int(arg[ai:], 16))
+        bi = token.end()
+        tag = token.group(1)
 
-        else:
-            output.append(int(tag, 16))
+        # A run of characters is converted at once
+        if tag is None:
+            output += token.group(2).translate(glyph_encoding).encode("latin-1")
 
-        bi += len(tag) + 2
+        else:
+            tag_bytes, newlines = do_encode_tag(tag)
+            output += tag_bytes
+            bi += newlines  # Account for the extra \n written after the tag
 
     output.extend((0x00, 0x00))
     return output
 
 
-def do_insert_msg(original_msg, text_file):
+def do_load_block_cache(cache_path):
+    # Read the encoded blocks cached by previous insertions, by the hash of their text.
+    # A missing or broken cache, or one written by another codec version, starts empty
+    block_cache = {"version": MSG_CODEC_VERSION, "blocks": {}}
+
+    if os.path.exists(cache_path):
+        try:
+            old_cache = json.load(open(cache_path, "r"))
+            if old_cache.get("version") == MSG_CODEC_VERSION:
+                block_cache = old_cache
+        except ValueError:
+            pass
+
+    block_cache["today"] = int(time.time() // 86400)
+    return block_cache
+
+
+def do_encode_cached_block(text_block, block_cache):
+    # Same as do_encode_text_block, but blocks encoded before are taken from the cache.
+    # Each block is stored as hex with the last day it was used
+    text_hash = hashlib.sha1(text_block.encode("utf-8")).hexdigest()
+    cached_block = block_cache["blocks"].get(text_hash)
+
+    if cached_block is None:
+        encoded_text_block = do_encode_text_block(text_block)
+        block_cache["blocks"][text_hash] = [encoded_text_block.hex(), block_cache["today"]]
+        return encoded_text_block
+
+    cached_block[1] = block_cache["today"]
+    return bytearray.fromhex(cached_block[0])
+
+
+def do_save_block_cache(cache_path, block_cache, max_age=BLOCK_CACHE_MAX_AGE, max_blocks=BLOCK_CACHE_MAX_BLOCKS):
+    today = block_cache["today"]
+    blocks = [(text_hash, cached_block) for text_hash, cached_block in block_cache["blocks"].items()
+              if today - cached_block[1] <= max_age]
+    # Keep the most recently used blocks
+    blocks.sort(key=lambda item: -item[1][1])
+
+    cache_data = {"version": MSG_CODEC_VERSION, "blocks": dict(blocks[:max_blocks])}
+    # Write to a temporary file first, so an interrupted write doesn't leave a broken cache
+    with open(cache_path + ".tmp", "w") as cache_file:
+        json.dump(cache_data, cache_file)
+    os.replace(cache_path + ".tmp", cache_path)
+
+
+def do_iter_text_block_spans(text):
+    # Yield where the text of each block of a TXT file starts and ends,
+    # without the [Block] line and the \n\n around the text
+    block_headers = list(block_header_pattern.finditer(text))
+
+    for block_num, block_header in enumerate(block_headers):
+        # If there is no more blocks after, read until the end of the file
+        if block_num + 1 == len(block_headers):
+            yield block_header.end() + 1, len(text) - 2
+        # If there is another block after, read until the beginning of the next block
+        else:
+            yield block_header.end() + 1, block_headers[block_num + 1].start() - 2
+
+
+def do_split_text_blocks(text):
+    # Yield the text of each block of a TXT file
+    for block_start, block_end in do_iter_text_block_spans(text):
+        yield text[block_start:block_end]
+
+
+def do_replace_text_blocks(text, new_text_blocks):
+    # Replace the text of some blocks of a TXT file, given by their position in the file. Ex: {3: "Hello<END>"}
+    pieces: list = []
+    last_end = 0
+    for block_num, (block_start, block_end) in enumerate(do_iter_text_block_spans(text)):
+        if block_num in new_text_blocks:
+            pieces.extend((text[last_end:block_start], new_text_blocks[block_num]))
+            last_end = block_end
+    pieces.append(text[last_end:])
+    return "".join(pieces)
+
+
+def do_layout_msg_blocks(encoded_block, ptr_tbl_size, file_size, share_blocks=False):
+    # Place the encoded blocks one after the other after the pointer table.
+    # Returns the pointer table, one pointer for each of the ptr_tbl_size // 2 blocks, and the data of the blocks.
+    # With share_blocks, a block identical to one placed before points to it instead of being stored again.
+    # The game only follows the pointers, so it doesn't notice
+    ptr_table: list = []
+    block_pointers: dict = {}
+    encoded_block_bytes = bytearray()
+
+    for encoded_text_block in encoded_block:
+        encoded_text_block = bytes(encoded_text_block)
+        if share_blocks and encoded_text_block in block_pointers:
+            ptr_table.append(block_pointers[encoded_text_block])
+            continue
+        ptr_table.append(ptr_tbl_size + len(encoded_block_bytes))
+        block_pointers.setdefault(encoded_text_block, ptr_table[-1])
+        encoded_block_bytes += encoded_text_block
+
+    return [items for items in ptr_table[:ptr_tbl_size // 2] if not items == file_size], encoded_block_bytes
+
+
+def do_encode_msg_text(text, ptr_tbl_size, file_size, size_limit, block_cache=None):
+    # Encode the text of a TXT file to the pointer table and data of a MSG file.
+    # If they don't fit in size_limit bytes, identical blocks are stored only once.
+    # Returns the pointer table, the data and the bytes saved by sharing blocks
+    # Encode text blocks to bytes
+    if block_cache is None:
+        encoded_block = [do_encode_text_block(text_block) for text_block in do_split_text_blocks(text)]
+    else:
+        encoded_block = [do_encode_cached_block(text_block, block_cache) for text_block in do_split_text_blocks(text)]
+
+    ptr_table, encoded_block_bytes = do_layout_msg_blocks(encoded_block, ptr_tbl_size, file_size)
+
+    # If the text is too big, try again storing identical blocks only once
+    if len(ptr_table) * 2 + len(encoded_block_bytes) > size_limit:
+        shared_ptr_table, shared_block_bytes = do_layout_msg_blocks(encoded_block, ptr_tbl_size, file_size, True)
+        if len(shared_block_bytes) < len(encoded_block_bytes):
+            return shared_ptr_table, shared_block_bytes, len(encoded_block_bytes) - len(shared_block_bytes)
+
+    return ptr_table, encoded_block_bytes, 0
+
+
+def do_insert_msg(original_msg, text_file, block_cache=None):
     print("\nInserting {}".format(original_msg))
     # Open TXT file
     text = open(text_file, "r").read()
@@ -329,337 +356,187 @@ def do_insert_msg(original_msg, text_file):
     # Read pointer table size
     msg_file.seek(header)
     ptr_tbl_size = bytes_to_uint(msg_file.read(2))
-    ptr_table: list = [ptr_tbl_size]
 
     print("Pointer table size is {} blocks ({} bytes)".format(ptr_tbl_size // 2, ptr_tbl_size))
 
-    i = 0
-    current_block = 1
-    encoded_block: list = []
-
-    while i < len(text):
-        # Skip the [Blocks] text but separate them for recalculating pointers
-        c = text[i]
-
-        if c == '[':
-            # Find the end of the textual Block info and start of next
-            block_end = text.find(']', i + 1)
-            next_block_start = text.find('[', i + 1)
-
-            # If there is no more blocks after, read until the end of the file
-            if next_block_start == -1:
-                text_block = text[block_end + 2:-2]
-            # If there is another block after, read until the beginning of the next block
-            else:
-                text_block = text[block_end + 2:next_block_start - 2]  # Remove the \n\n at beginning and end of block
-
-            # Encode text block to list of bytes
-            encoded_text_block = do_encode_text_block(text_block)
-            encoded_block.append(encoded_text_block)
-
-            if current_block != ptr_tbl_size // 2:
-                # Append the size of the encoded block to the pointer table
-                ptr_table.append(ptr_table[-1] + len(encoded_text_block))
-                current_block += 1
-
-        i += 1
-
-    # Convert pointer table int to sequence of bytes
-    ptr_table_bytes: bytes = b''
-    for items in ptr_table:
-        if not items == file_size:
-            ptr_table_bytes += (uint_to_bytes(items))
+    # Get size of file
+    msg_file_size = msg_file.seek(0, os.SEEK_END)
 
-    # Convert list of lists of encoded blocks to bytes
-    encoded_block_bytes = bytes([val for sublist in encoded_block for val in sublist])
+    try:
+        ptr_table, encoded_block_bytes, saved_size = do_encode_msg_text(text, ptr_tbl_size, file_size,
+                                                                        msg_file_size - header, block_cache)
+    except encode_errors as e:
+        print("ERROR: {} can't be encoded: {}".format(text_file, e))
+        msg_file.close()
+        return None
+    if saved_size:
+        print("Identical blocks share their data, saving {} bytes".format(saved_size))
     print("Encoded text data size is {} bytes".format(len(encoded_block_bytes)))
 
-    # Get size of file
-    msg_file_size = msg_file.seek(0, os.SEEK_END)
     # Get size of new file
-    new_file_size = header + len(ptr_table_bytes) + len(encoded_block_bytes)
+    data_size = len(ptr_table) * 2 + len(encoded_block_bytes)
+    new_file_size = header + data_size
 
     # Check if the new size is within the limits. Else throw and exception
     if new_file_size > msg_file_size:
         print("ERROR: New MSG file is {} bytes. Size limit is {} bytes.".format(new_file_size, msg_file_size))
-        exit()
+        msg_file.close()
+        return None
     else:
-        # Write new data to the MSG file
-        msg_file.seek(header)
-        msg_file.write(ptr_table_bytes + encoded_block_bytes)
-        # Get offset after writing pointer table and encoded text
-        current_offset = msg_file.tell()
-        # Write the new file size to the header
-        msg_file.seek(4)
-        msg_file.write(ulong_to_bytes(current_offset - header))
-        msg_file.seek(current_offset)
-        msg_file.seek(current_offset)
+        # Put together pointer table, encoded text and the 00 filling the rest of the file
+        msg_data = bytearray(msg_file_size - header)
+        struct.pack_into("<{}H".format(len(ptr_table)), msg_data, 0, *ptr_table)
+        msg_data[len(ptr_table) * 2:data_size] = encoded_block_bytes
 
-        # Fill the rest of the file with 00
-        while current_offset < msg_file_size:
-            msg_file.write(b'\x00')
-            current_offset += 1
+        # Write the new file size to the header, then the new data to the MSG file
+        msg_file.seek(4)
+        msg_file.write(ulong_to_bytes(data_size))
+        msg_file.seek(header)
+        msg_file.write(msg_data)
 
     msg_file.close()
 
+    return len(ptr_table)
 
-def do_decode_block(block_data):
-    decoded_block = ''
-    i = 0
-    sel_counter = 0
-
-    while i < len(block_data):
-        b1 = block_data[i]
-        b2 = block_data[i + 1] if i + 1 < len(block_data) else None
-        b3 = block_data[i + 2] if i + 2 < len(block_data) else None
-        b4 = block_data[i + 3] if i + 3 < len(block_data) else None
-        b5 = block_data[i + 4] if i + 4 < len(block_data) else None
-        b6 = block_data[i + 5] if i + 5 < len(block_data) else None
-        b7 = block_data[i + 6] if i + 6 < len(block_data) else None
-        b8 = block_data[i + 7] if i + 7 < len(block_data) else None
-        b9 = block_data[i + 8] if i + 8 < len(block_data) else None
-        b10 = block_data[i + 9] if i + 9 < len(block_data) else None
-        b11 = block_data[i + 10] if i + 10 < len(block_data) else None
-
-        try:
-            decoded_block += char_table[b1]
-        except KeyError:
-
-            if b1 == 0x84:
-                decoded_block += '<CLOSE {:02X}{:02X}>\n'.format(b3, b2)
-                i += 2
-
-            elif b1 == 0x87:  # 0000 Closes the window. 0004 Clears the text.
-                decoded_block += '<CLEAR {:02X}{:02X}>\n'.format(b3, b2)
-                i += 2
 
-            elif b1 == 0x89:  # 00 = White, 01 = Green?, 02 = Red, 04 = Blue, 05 = Purple
-                decoded_block += '<COLOR {:02X}>'.format(b2)
-                i += 1
+def do_decode_tag(opcode, args):
+    # Convert a control code and its argument bytes to a tag, following its layout in msg_opcodes
+    if opcode.layout == "LE":
+        tag = '<{} {}>'.format(opcode.name, bytes(reversed(args)).hex().upper())
 
-            elif b1 == 0x8A:  # TODO: Verify in game. Looks like a wrapper for something.
-                decoded_block += '<UNK_8A {:02X}{:02X}>'.format(b3, b2)
-                i += 2
+    elif opcode.layout == "BE":
+        tag = '<{} {}>'.format(opcode.name, bytes(args).hex().upper())
 
-            elif b1 == 0x8B:
-                decoded_block += '<PAUSE {:02X}{:02X}>'.format(b3, b2)
-                i += 2
+    elif opcode.layout in ("M", "SEL"):
+        tag_arguments: list = []
+        arg_offset = 0
+        # MULTI has one more argument for each SEL tag, named after its number. Ex: <MULTI T=00 0=01 1=02>
+        arg_names = list(opcode.size) + [(str(arg_num), 1) for arg_num in range(len(args) - opcode.arg_len)]
+        for arg_name, arg_size in arg_names:
+            tag_arguments.append('{}={}'.format(
+                arg_name, bytes(reversed(args[arg_offset:arg_offset + arg_size])).hex().upper()))
+            arg_offset += arg_size
+        tag = '<{} {}>'.format(opcode.name, " ".join(tag_arguments))
 
-            elif b1 == 0x8C:
-                decoded_block += \
-                    '<WIN PX={:02X}{:02X} PY={:02X}{:02X} SX={:02X} SY={:02X}>\n'.format(b3, b2, b5, b4, b6, b7)
-                i += 6
-
-            elif b1 == 0x8D:  # TODO: Verify in game
-                decoded_block += '<UNK_8D {:02X}>'.format(b2)
-                i += 1
+    else:
+        tag = '<{}>'.format(opcode.name)
 
-            elif b1 == 0x8E:  # TODO: Verify in game
-                decoded_block += '<UNK_8E {:02X}{:02X}>'.format(b3, b2)
-                i += 2
+    return tag + '\n' * opcode.newlines
 
-            elif b1 == 0x8F:
-                decoded_block += '<AUDIO {:02X}{:02X}{:02X}{:02X}>\n'.format(b5, b4, b3, b2)
-                i += 4
 
-            elif b1 == 0x93:  # WT 0=Normal, 1=Dim Full Screen, 2=Lighter, 4/8=No Color | BORDER=Padding of all sides
-                decoded_block += '<DECOR WT={:02X} PAD={:02X}>\n'.format(b2, b3)
-                i += 2
+def do_decode_block(block_data):
+    block_data = bytes(block_data)
+    decoded_block: list = []
+    i = 0
+    sel_counter = 0
 
-            elif b1 == 0x94:
-                decoded_block += '<MOVE_FREE>'
+    while i < len(block_data):
+        # Convert a whole run of characters at once, only control codes are handled one by one
+        glyph_run = glyph_run_pattern.match(block_data, i)
+        if glyph_run is not None:
+            decoded_block.append(glyph_run.group().decode("latin-1").translate(char_table))
+            i = glyph_run.end()
+            continue
 
-            elif b1 == 0x96:  # Probably b2 and b3 are used for positioning. b4 no idea. Needs testing
-                decoded_block += '<SEL {:02X}{:02X}>'.format(b3, b2)
+        b1 = block_data[i]
+        opcode = msg_opcodes.get(b1)
+        arg_len = 0
+        if opcode is not None:
+            arg_len = opcode.arg_len + (sel_counter if opcode.layout == "SEL" else 0)
+
+        # Unknown control codes, and the ones cut short by the end of the block, are kept as their hex value
+        if opcode is None or i + arg_len >= len(block_data):
+            decoded_block.append('<{:02X}>'.format(b1))
+        else:
+            decoded_block.append(do_decode_tag(opcode, block_data[i + 1:i + 1 + arg_len]))
+            if opcode.name == "SEL":
                 sel_counter += 1
-                i += 2
-
-            elif b1 == 0x97:
-                decoded_block += '<MULTI T={:02X}'.format(b2)
-                arg_num = 0
-                args = block_data[i + 2: i + 2 + sel_counter]
-                while arg_num < sel_counter:
-                    decoded_block += ' {}={:02X}'.format(arg_num, args[arg_num])
-                    arg_num += 1
-                decoded_block += '>'
-                i += sel_counter + 1  # Account for the type argument
-
-            elif b1 == 0x99:
-                decoded_block += '<CALL {:02X}{:02X}>'.format(b2, b3)
-                i += 2
-
-            elif b1 == 0x9A:
-                decoded_block += '<GET {:02X}{:02X}>'.format(b3, b2)
-                i += 2
-
-            elif b1 == 0x9B:  # Something item related
-                decoded_block += '<GIVE {:02X}{:02X}>'.format(b3, b2)
-                i += 2
-
-            elif b1 == 0x9C:  # Calls a dialog if it hasn't been used yet. Or the selected one.
-                decoded_block += '<MSG_IF 1={:02X} 2={:02X} 3={:02X} 4={:02X}>\n'.format(b2, b3, b4, b5)
-                i += 4
-
-            elif b1 == 0x9F:
-                decoded_block += '<NEXT>\n\n'
-
-            elif b1 == 0xA0:
-                decoded_block += '<PAD {:02X}{:02X}>'.format(b3, b2)
-                i += 2
-
-            elif b1 == 0xA1:  # Window type? Not 100% sure
-                decoded_block += '<AUTO>'
-
-            elif b1 == 0xA2:  # Window type? Not 100% sure
-                decoded_block += '<MANUAL>'
-
-            elif b1 == 0xA4:
-                decoded_block += '<WAIT {:02X}{:02X}>\n'.format(b3, b2)
-                i += 2
-
-            elif b1 == 0xA5:  # V=Character Visibility, Z=Axis (Zoom), X=X Axis (Rotation), P=Pitch, Y=Axis
-                decoded_block += '<CAM V={:02X}{:02X} Z={:02X}{:02X} X={:02X}{:02X} P={:02X}{:02X} Y={:02X}{:02X}>' \
-                                 '\n'.format(b3, b2, b5, b4, b7, b6, b9, b8, b11, b10)
-                i += 10
-
-            elif b1 == 0xA6:  # TODO: Verify in game
-                decoded_block += '<UNK_A6 {:02X}{:02X}>\n'.format(b3, b2)
-                i += 2
-
-            elif b1 == 0xA7:  # TODO: Verify in game. Possible camera animation.
-                decoded_block += '<UNK_A7 {:02X}{:02X}{:02X}{:02X}{:02X}{:02X}{:02X}{:02X}>' \
-                                 ''.format(b2, b3, b4, b5, b6, b7, b8, b9)
-                i += 8
-
-            elif b1 == 0xA9:  # TODO: Verify in game
-                decoded_block += '<END>'
-
-            elif b1 == 0xAC:  # Weird cases.
-                decoded_block += '<EXE_JUMP {:02X}{:02X}>'.format(b3, b2)
-                i += 2
-
-            elif b1 == 0xAE:
-                decoded_block += '<OPTION {:02X}{:02X}>'.format(b3, b2)
-                i += 2
-
-            elif b1 == 0xAD:  # Similar to 0x96 but apparently able to move the curson position with multiple options
-                decoded_block += '<UNK_AD {:02X}{:02X}{:02X}{:02X}{:02X}{:02X}>'.format(b2, b3, b4, b5, b6, b7)
-                i += 6
-
-            elif b1 == 0xAF:  # TODO: Verify in game
-                decoded_block += '<UNK_AF {:02X}>\n'.format(b2)
-                i += 1
-
-            elif b1 == 0xB2:
-                decoded_block += '<RESTORE_HP>'
-
-            elif b1 == 0xB3:
-                decoded_block += '<RESTORE_SP>'
+            i += arg_len
+        i += 1
 
-            elif b1 == 0xB4:
-                decoded_block += '<RESTORE_SHIELD>'
+    return "".join(decoded_block)
 
-            elif b1 == 0xB9:
-                decoded_block += '<IF A={:02X}{:02X} JMP={:02X}>'.format(b3, b2, b4)
-                i += 3
 
-            elif b1 == 0xBA:
-                decoded_block += '<COST>'
+def do_iter_msg_block_data(msg_file):
+    # Yield (block_number, start, end, block_data) for each block of a MSG file (header included),
+    # with the data of the block without its 0x0000 at the end
+    # Read the actual file size
+    file_size = bytes_to_uint(msg_file[4:8])
+    # Read pointer table size
+    ptr_tbl_size = bytes_to_uint(msg_file[header:header + 2])
+    # Read pointer table data
+    ptr_tbl_data = msg_file[header:header + ptr_tbl_size]
 
-            elif b1 == 0xBF:
-                decoded_block += '<JUMP {:02X}{:02X}>'.format(b2, b3)
-                i += 2
+    pointers = [bytes_to_uint(ptr_tbl_data[ptr_tbl_offset:ptr_tbl_offset + 2])
+                for ptr_tbl_offset in range(0, ptr_tbl_size, 2)]
+    # Each block ends where the closest block after it starts. That's the next pointer, unless identical blocks
+    # share their data (see do_layout_msg_blocks). The file size is used for the last bank
+    block_ends = sorted(set(pointers))
 
-            elif b1 == 0xC8:
-                decoded_block += '<ZENNY_AMOUNT>'
+    for block_number, pointer in enumerate(pointers):
+        next_block = bisect.bisect_right(block_ends, pointer)
+        block_start_offset = header + pointer
+        # Accounting for the 0x0000 at the end of each block so -2
+        block_end_offset = header + (block_ends[next_block] if next_block < len(block_ends) else file_size) - 2
 
-            elif b1 == 0xD0:
-                decoded_block += '<ITEM {:02X}>'.format(b2)
-                i += 1
+        # The end offset includes the 0x0000, like in the TXT file
+        yield block_number, block_start_offset, block_end_offset + 2, msg_file[block_start_offset:block_end_offset]
 
-            elif b1 == 0xD1:  # Some kind of variable
-                decoded_block += '<UNK_D1 {:02X}{:02X}>'.format(b3, b2)
-                i += 2
 
-            elif b1 == 0xD3:
-                decoded_block += '<PRICE_ZENNY>'
+def do_iter_msg_blocks(msg_file):
+    # Yield (block_number, start, end, decoded_text) for each block of a MSG file (header included).
+    # Blocks are decoded one at a time as they are asked for, so msg_file can be a mmap of a file of any size
+    for block_number, block_start_offset, block_end_offset, block_data in do_iter_msg_block_data(msg_file):
+        yield block_number, block_start_offset, block_end_offset, do_decode_block(block_data)
 
-            elif b1 == 0xD4:  # Some kind of variable
-                decoded_block += '<UNK_D4 {:02X}>'.format(b2)
-                i += 1
 
-            elif b1 == 0xD6:  # TODO: Verify in game
-                decoded_block += '<UNK_D6 {:02X}{:02X}>'.format(b3, b2)
-                i += 2
+def do_format_msg_block(block_number, block_start_offset, block_end_offset, decoded_text):
+    # Each block in the TXT file starts with its number and offsets
+    return "[Block {:02X}, String: {:04X}-{:04X}]\n{}\n\n".format(
+        block_number, block_start_offset, block_end_offset, decoded_text)
 
-            elif b1 == 0xD7:  # TODO: Verify in game
-                decoded_block += '<UNK_D7 {:02X}{:02X}{:02X}{:02X}>'.format(b5, b4, b3, b2)
-                i += 4
 
-            elif b1 == 0xDA:  # TODO: Verify in game. Menu stuff. Some kind of inventory variable
-                decoded_block += '<UNK_DA {:02X}{:02X}>'.format(b2, b3)
-                i += 2
+def do_write_msg_text(msg_blocks, output_file, buffer_size=65536):
+    # Write blocks from do_iter_msg_blocks to a TXT file, collecting them into writes of about buffer_size chars.
+    # Returns the number of blocks written
+    pending: list = []
+    pending_size = 0
+    block_count = 0
 
-            elif b1 == 0xDB:  # TODO: Verify in game
-                decoded_block += '<UNK_DB {:02X}{:02X}{:02X}{:02X}>'.format(b2, b3, b4, b5)
-                i += 4
+    for msg_block in msg_blocks:
+        pending.append(do_format_msg_block(*msg_block))
+        pending_size += len(pending[-1])
+        block_count += 1
+        if pending_size >= buffer_size:
+            output_file.write("".join(pending))
+            pending.clear()
+            pending_size = 0
 
-            elif b1 == 0xDD:  # TODO: Verify in game
-                decoded_block += '<UNK_DD {:02X}{:02X}{:02X}{:02X}>'.format(b2, b3, b4, b5)
-                i += 4
+    output_file.write("".join(pending))
 
-            elif b1 == 0xE1:  # TODO: Verify in game. Menu stuff. Some kind of inventory variable
-                decoded_block += '<UNK_E1 {:02X}{:02X}>'.format(b2, b3)
-                i += 2
+    return block_count
 
-            elif b1 == 0xE3:  # TODO: Verify in game
-                decoded_block += '<UNK_E3 {:02X}{:02X}>'.format(b2, b3)
-                i += 2
 
-            else:
-                decoded_block += '<{:02X}>'.format(b1)
-        i += 1
-
-    return decoded_block
+def do_decode_msg(msg_file):
+    # Decode a whole MSG file (header included) to the text written by do_extract_msg
+    return "".join(do_format_msg_block(*msg_block) for msg_block in do_iter_msg_blocks(msg_file))
 
 
 def do_extract_msg(file_path):
+    # Decode a MSG file to its TXT file. Returns the hash of each block, since the MSG file holds the translated
+    # text once something is inserted
     print("\nExtracting {}".format(file_path))
-    # Open MSG file
-    msg_file = open(file_path, "rb").read()
-    # Read the actual file size
-    file_size = bytes_to_uint(msg_file[4:8])
-    # Read pointer table size
-    ptr_tbl_size = bytes_to_uint(msg_file[header:header + 2])
-    # Read pointer table data
-    ptr_tbl_data = msg_file[header:header + ptr_tbl_size]
-
-    print("Pointer table contains {} blocks".format(int(ptr_tbl_size // 2)))
-
-    output_file = open(file_path + ".txt", "w")
-
-    ptr_tbl_offset = 0
-    block_number = 0
-
-    while ptr_tbl_offset < ptr_tbl_size:
-        block_start_offset = header + bytes_to_uint(ptr_tbl_data[ptr_tbl_offset:ptr_tbl_offset + 2])
-        # Accounting for the 0x0000 at the end of each block so -2
-        block_end_offset = header + bytes_to_uint(ptr_tbl_data[ptr_tbl_offset + 2:ptr_tbl_offset + 4]) - 2
-        # If we reached the end of the offset table, use the file size for the last bank
-        if block_end_offset == 2048 - 2:
-            # Accounting for the 0x0000 at the end of each block so -2
-            block_end_offset = header + file_size - 2
+    # Map the MSG file, blocks are read from it as they are decoded
+    msg_file = do_map_file(file_path)
 
-        block_data = msg_file[block_start_offset:block_end_offset]
+    print("Pointer table contains {} blocks".format(bytes_to_uint(msg_file[header:header + 2]) // 2))
 
-        # Write each block with offset information (add 2 to block end offset to account for 0x0000)
-        output_file.write(
-            "[Block {:02X}, String: {:04X}-{:04X}]\n".format(block_number, block_start_offset, block_end_offset + 2)
-        )
+    with open(file_path + ".txt", "w") as output_file:
+        do_write_msg_text(do_iter_msg_blocks(msg_file), output_file)
 
-        output_file.write(do_decode_block(block_data) + "\n\n")
+    block_hashes = [hashlib.sha1(block_data).hexdigest() for _, _, _, block_data in do_iter_msg_block_data(msg_file)]
 
-        ptr_tbl_offset += 2
-        block_number += 1
+    if not isinstance(msg_file, bytes):
+        msg_file.close()
 
-    output_file.close()
+    return block_hashes
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import struct
+import zlib
+
+png_signature = b'\x89PNG\r\n\x1a\n'
+
+# Color types of the PNG header
+png_grayscale = 0
+png_indexed = 3
+
+
+def do_write_png_chunk(png_file, chunk_type, chunk_data):
+    png_file.write(struct.pack(">I", len(chunk_data)))
+    png_file.write(chunk_type + chunk_data)
+    png_file.write(struct.pack(">I", zlib.crc32(chunk_type + chunk_data)))
+
+
+def do_write_png(png_path, width, height, bit_depth, palette, transparency, rows):
+    # Write an indexed PNG. palette holds the RGB of each color, transparency the alpha of the first ones or None.
+    # rows yields the pixel data of each line, already in PNG order, so the image is compressed as it's read.
+    # Indexed images compress best without filters, so every line uses filter 0
+    with open(png_path, "wb") as png_file:
+        png_file.write(png_signature)
+        do_write_png_chunk(png_file, b'IHDR', struct.pack(">IIBBBBB", width, height, bit_depth, png_indexed, 0, 0, 0))
+        do_write_png_chunk(png_file, b'PLTE', palette)
+        if transparency:
+            do_write_png_chunk(png_file, b'tRNS', transparency)
+
+        compressor = zlib.compressobj(9)
+        for row in rows:
+            compressed_data = compressor.compress(b'\x00' + row)
+            if compressed_data:
+                do_write_png_chunk(png_file, b'IDAT', compressed_data)
+        do_write_png_chunk(png_file, b'IDAT', compressor.flush())
+
+        do_write_png_chunk(png_file, b'IEND', b'')
+
+
+def do_paeth(left, up, up_left):
+    estimate = left + up - up_left
+    distance_left = abs(estimate - left)
+    distance_up = abs(estimate - up)
+    distance_up_left = abs(estimate - up_left)
+    if distance_left <= distance_up and distance_left <= distance_up_left:
+        return left
+    if distance_up <= distance_up_left:
+        return up
+    return up_left
+
+
+def do_unfilter_row(filter_type, row, prior_row):
+    # Undo the filter of a line. Indexed and grayscale images up to 8 bits have one byte per pixel at most,
+    # so the byte on the left is always the one before
+    if filter_type == 0:
+        return row
+    for i in range(len(row)):
+        left = row[i - 1] if i else 0
+        if filter_type == 1:
+            row[i] = (row[i] + left) & 0xFF
+        elif filter_type == 2:
+            row[i] = (row[i] + prior_row[i]) & 0xFF
+        elif filter_type == 3:
+            row[i] = (row[i] + ((left + prior_row[i]) >> 1)) & 0xFF
+        elif filter_type == 4:
+            row[i] = (row[i] + do_paeth(left, prior_row[i], prior_row[i - 1] if i else 0)) & 0xFF
+        else:
+            raise ValueError("Unknown PNG filter {}".format(filter_type))
+    return row
+
+
+def do_take_rows(pending_data, row_size, prior_row, pixel_data):
+    # Move the lines fully decompressed so far to pixel_data, without their filter. Returns the last line
+    while len(pending_data) > row_size:
+        prior_row = do_unfilter_row(pending_data[0], pending_data[1:row_size + 1], prior_row)
+        pixel_data += prior_row
+        del pending_data[0:row_size + 1]
+    return prior_row
+
+
+def do_read_png(png_data):
+    # Read an indexed or grayscale PNG. Returns width, height, bit depth, color type and the pixel data of all the
+    # lines without their filter byte, or None if it's not a PNG this tool can read
+    if png_data[0:8] != png_signature:
+        print("Not a PNG file")
+        return None
+
+    offset = 8
+    image_header = None
+    decompressor = zlib.decompressobj()
+    pixel_data = bytearray()
+    pending_data = bytearray()
+    prior_row = None
+    row_size = 0
+
+    while offset + 8 <= len(png_data):
+        chunk_size, chunk_type = struct.unpack(">I4s", png_data[offset:offset + 8])
+        if offset + 12 + chunk_size > len(png_data):
+            break
+        chunk_data = png_data[offset + 8:offset + 8 + chunk_size]
+        if struct.unpack(">I", png_data[offset + 8 + chunk_size:offset + 12 + chunk_size])[0] != \
+                zlib.crc32(chunk_type + chunk_data):
+            print("Broken PNG chunk {}".format(chunk_type.decode("latin-1")))
+            return None
+        offset += 12 + chunk_size
+
+        if chunk_type == b'IHDR':
+            image_header = struct.unpack(">IIBBBBB", chunk_data)
+            width, height, bit_depth, color_type, compression, png_filter, interlace = image_header
+            if color_type not in (png_grayscale, png_indexed) or bit_depth > 8 or interlace:
+                print("Only indexed or grayscale PNG files up to 8 bits per pixel and not interlaced are supported")
+                return None
+            row_size = (width * bit_depth + 7) // 8
+            prior_row = bytearray(row_size)
+
+        elif chunk_type == b'IDAT' and image_header is not None:
+            # Undo the filter of each line as soon as it's decompressed
+            pending_data += decompressor.decompress(chunk_data)
+            prior_row = do_take_rows(pending_data, row_size, prior_row, pixel_data)
+
+        elif chunk_type == b'IEND':
+            break
+
+    if image_header is not None:
+        pending_data += decompressor.flush()
+        do_take_rows(pending_data, row_size, prior_row, pixel_data)
+
+    if image_header is None or len(pixel_data) != row_size * image_header[1]:
+        print("PNG file is incomplete")
+        return None
+
+    return image_header[0], image_header[1], image_header[2], image_header[3], pixel_data
@@ -1,6 +1,81 @@
 #!/usr/bin/env python3
 
+import os
+import struct
+from functools import lru_cache
+
 from Formats.BIN import bytes_to_uint, ulong_to_bytes, uint_to_bytes
+from Formats.PNG import png_signature, do_write_png, do_read_png
+
+# NumPy is optional, the blocks are copied one line at a time without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# MML TIM pixels are stored in blocks of 64 bytes by 32 lines (64x32 pixels in 8bpp, 128x32 in 4bpp)
+block_row_size = 64
+block_lines = 32
+
+# PNG keeps the left pixel of a 4bpp byte in the high nibble, the PSX in the low one
+nibble_swap_table = bytes(((px << 4) & 0xF0) | (px >> 4) for px in range(256))
+
+
+@lru_cache(maxsize=64)
+def do_get_block_line_offsets(row_size, height):
+    # Where each line of each block starts in line order, with the blocks in the order they are stored.
+    # Textures come in a few sizes only, so the table of each size is made once
+    return tuple(block_row * row_size + block_column + line * row_size
+                 for block_row in range(0, height, block_lines)
+                 for block_column in range(0, row_size, block_row_size)
+                 for line in range(block_lines))
+
+
+@lru_cache(maxsize=16)
+def do_get_pixel_order(row_size, height):
+    # Where each byte in block order goes in line order, for images not made of whole blocks.
+    # The blocks on the right and bottom edges are still read whole
+    return tuple((block_row + line) * row_size + block_column + line_byte
+                 for block_row in range(0, height, block_lines)
+                 for block_column in range(0, row_size, block_row_size)
+                 for line in range(block_lines)
+                 for line_byte in range(block_row_size))
+
+
+def do_swizzle_blocks(pixel_data, row_size, height, encode=False):
+    # Reorder pixel data from the block order (blocks left to right, then top to bottom, each one line by line)
+    # to the usual line order, or back with encode. row_size is the width in bytes, a multiple of the block size
+    # as is height. Returns a bytearray, or None if pixel_data is too short
+    block_rows = height // block_lines
+    block_columns = row_size // block_row_size
+
+    # Slices past the end would resize the output instead of failing
+    if len(pixel_data) < row_size * height:
+        print("ERROR: Pixel data is {} bytes instead of {} bytes".format(len(pixel_data), row_size * height))
+        return None
+
+    if numpy is not None:
+        pixels = numpy.frombuffer(pixel_data, dtype=numpy.uint8, count=row_size * height)
+        # Block order is (block row, block column, line, byte) and line order (block row, line, block column, byte)
+        if not encode:
+            pixels = pixels.reshape(block_rows, block_columns, block_lines, block_row_size)
+        else:
+            pixels = pixels.reshape(block_rows, block_lines, block_columns, block_row_size)
+        return bytearray(pixels.transpose(0, 2, 1, 3).tobytes())
+
+    pixel_data = memoryview(pixel_data)
+    ord_pixel_data = bytearray(row_size * height)
+
+    for block_offset, line_offset in zip(range(0, row_size * height, block_row_size),
+                                         do_get_block_line_offsets(row_size, height)):
+        if not encode:
+            ord_pixel_data[line_offset:line_offset + block_row_size] = \
+                pixel_data[block_offset:block_offset + block_row_size]
+        else:
+            ord_pixel_data[block_offset:block_offset + block_row_size] = \
+                pixel_data[line_offset:line_offset + block_row_size]
+
+    return ord_pixel_data
 
 
 def do_ord_pixel_data(tim_colors, tim_img_size, tim_width, tim_height, tim_pixel_data, encode=None):
@@ -8,58 +83,83 @@ def do_ord_pixel_data(tim_colors, tim_img_size, tim_width, tim_height, tim_pixel
     timcolors: int = 0
     timw: int = 0
     timh: int = 0
-    ord_pixel_data: list = []
+    pixel_data_size: int = 0
 
     if not encode:
         timcolors = bytes_to_uint(tim_colors)
         timh = bytes_to_uint(tim_height)
         timw = bytes_to_uint(tim_width)
-        ord_pixel_data = [0] * (bytes_to_uint(tim_img_size) - 12)
+        pixel_data_size = bytes_to_uint(tim_img_size) - 12
     elif encode:
         timcolors = tim_colors
         timh = tim_height
         timw = tim_width
-        ord_pixel_data = [0] * (tim_img_size - 12)
-
-    blockw = 64
-    blockh = 32
-
-    rofs = 0
-
-    if timcolors == 16:
-        inc = 2
-        blockw = blockw * 2
-        timw = timw * 4  # Multiply by 4 to get the real width
-
-        for y in range(0, timh, blockh):
-            for x in range(0, timw, blockw):
-                for by in range(0, blockh):
-                    for bx in range(0, blockw, inc):
-                        if not encode:
-                            px = tim_pixel_data[rofs]
-                            ord_pixel_data[((y + by) * (timw // 2)) + ((x + bx) // 2)] = px
-                        else:
-                            px = tim_pixel_data[((y + by) * (timw // 2)) + ((x + bx) // 2)]
-                            ord_pixel_data[rofs] = px
-                        rofs += 1
-        return ord_pixel_data
-
-    elif timcolors == 256:
-        inc = 1
-        timw = timw * 2  # Multiply by 2 to get the real width
-
-        for y in range(0, timh, blockh):
-            for x in range(0, timw, blockw):
-                for by in range(0, blockh):
-                    for bx in range(0, blockw, inc):
-                        if not encode:
-                            px = tim_pixel_data[rofs]
-                            ord_pixel_data[((y + by) * timw) + (x + bx)] = px
-                        else:
-                            px = tim_pixel_data[((y + by) * timw) + (x + bx)]
-                            ord_pixel_data[rofs] = px
-                        rofs += 1
-        return ord_pixel_data
+        pixel_data_size = tim_img_size - 12
+
+    if timcolors not in (16, 256):
+        print("ERROR: TIM files with {} colors are not supported".format(timcolors))
+        return None
+
+    # Images made of whole blocks are reordered a line of a block at a time, or at once with NumPy.
+    # The width is in 16 bits units for both 4bpp and 8bpp, so it's the same layout in bytes
+    if (timw * 2) % block_row_size == 0 and timh % block_lines == 0:
+        return do_swizzle_blocks(tim_pixel_data, timw * 2, timh, encode)
+
+    # Other sizes are reordered a byte at a time
+    ord_pixel_data = [0] * pixel_data_size
+    for rofs, index in enumerate(do_get_pixel_order(timw * 2, timh)):
+        if not encode:
+            ord_pixel_data[index] = tim_pixel_data[rofs]
+        else:
+            ord_pixel_data[rofs] = tim_pixel_data[index]
+
+    return ord_pixel_data
+
+
+def do_clut_to_palette(clut):
+    # Convert a CLUT of PSX colors (5 bits for red, green and blue) to a PNG palette and the alpha of its colors.
+    # 0x0000 is drawn transparent by the PSX, so it gets an alpha of 0
+    palette = bytearray()
+    transparency = bytearray()
+    for color in struct.unpack("<{}H".format(len(clut) // 2), clut):
+        for shift in (0, 5, 10):
+            value = (color >> shift) & 0x1F
+            palette.append((value << 3) | (value >> 2))
+        transparency.append(0 if color == 0 else 255)
+    # The alpha of the colors after the last transparent one can be left out
+    return bytes(palette), bytes(transparency.rstrip(b'\xFF'))
+
+
+def do_write_tim_png(png_path, pixel_data, row_size, height, tim_colors, clut):
+    # Write pixel data in line order as an indexed PNG using the CLUT as its palette
+    bit_depth = 4 if tim_colors == 16 else 8
+    palette, transparency = do_clut_to_palette(clut)
+    pixel_data = memoryview(pixel_data)
+
+    if bit_depth == 4:
+        rows = (bytes(pixel_data[y:y + row_size]).translate(nibble_swap_table)
+                for y in range(0, row_size * height, row_size))
+    else:
+        rows = (bytes(pixel_data[y:y + row_size]) for y in range(0, row_size * height, row_size))
+
+    do_write_png(png_path, row_size * 8 // bit_depth, height, bit_depth, palette, transparency, rows)
+
+
+def do_read_tim_png(png_data, tim_colors, row_size, height):
+    # Read the pixel data of a PNG exported by do_write_tim_png, in line order.
+    # Returns None if it's not the same size and bits per pixel of the TIM
+    png_image = do_read_png(png_data)
+    if png_image is None:
+        return None
+
+    width, png_height, bit_depth, color_type, pixel_data = png_image
+    tim_bit_depth = 4 if tim_colors == 16 else 8
+    if (width, png_height, bit_depth) != (row_size * 8 // tim_bit_depth, height, tim_bit_depth):
+        print("PNG is {}x{} with {} bits per pixel. Expected {}x{} with {} bits per pixel".format(
+            width, png_height, bit_depth, row_size * 8 // tim_bit_depth, height, tim_bit_depth))
+        return None
+
+    return pixel_data.translate(nibble_swap_table) if bit_depth == 4 else pixel_data
 
 
 def do_insert_tim(original_tim, edited_tim):
@@ -70,6 +170,29 @@ def do_insert_tim(original_tim, edited_tim):
     original_tim = open(original_tim, "rb+")
     edited_tim = open(edited_tim, "rb").read()
 
+    # PNG exported by do_export_tim_png. Its size and colors come from the original TIM
+    if edited_tim[0:8] == png_signature:
+        mml_header = original_tim.read(44)
+        tim_colors = bytes_to_uint(mml_header[20:22])
+        tim_width = bytes_to_uint(mml_header[36:40])
+        tim_height = bytes_to_uint(mml_header[40:44])
+
+        tim_pixel_data = do_read_tim_png(edited_tim, tim_colors, tim_width * 2, tim_height)
+        if tim_pixel_data is None:
+            original_tim.close()
+            return None
+
+        ord_pixel_data = do_ord_pixel_data(tim_colors, tim_width * tim_height * 2 + 12, tim_width, tim_height,
+                                           tim_pixel_data, encode=True)
+        if ord_pixel_data is None:
+            original_tim.close()
+            return None
+
+        original_tim.seek(header)
+        original_tim.write(bytearray(ord_pixel_data))
+        original_tim.close()
+        return len(ord_pixel_data)
+
     # Check if TIM file
     if edited_tim[0:4] == b'\x10\x00\x00\x00' and any(bpp in edited_tim[4:6] for bpp in (b'\x08\x00', b'\x09\x00')):
 
@@ -88,18 +211,24 @@ def do_insert_tim(original_tim, edited_tim):
         tim_pixel_data: bytes = edited_tim[tim_clut_size + 20:]
 
         ord_pixel_data = do_ord_pixel_data(tim_colors, tim_img_size, tim_width, tim_height, tim_pixel_data, encode=True)
+        if ord_pixel_data is None:
+            original_tim.close()
+            return None
 
         original_tim.seek(header)
         original_tim.write(bytearray(ord_pixel_data))
         original_tim.close()
+        return len(ord_pixel_data)
 
+    print("ERROR: The edited file is not a TIM or PNG file")
+    original_tim.close()
+    return None
 
-def do_extract_tim(file_path):
-    header = 2048  # 0x800
 
-    print("Extracting {}".format(file_path))
-    # Open TIM file
-    tim_file = open(file_path, "rb").read()
+def do_decode_tim(tim_file):
+    # Convert a MML TIM (header included) to a regular TIM. Returns None for the CLUT only types,
+    # or if the pixel data is incomplete
+    header = 2048  # 0x800
 
     # 4bpp and 8bpp TIM file
     if tim_file[0:4] == b'\x01\x00\x00\x00':
@@ -128,13 +257,28 @@ def do_extract_tim(file_path):
         # tim_pixel_data = bytes(((x << 4 & 0xF0) + (x >> 4)) for x in tim_pixel_data)
 
         ord_pixel_data = do_ord_pixel_data(tim_colors, tim_img_size, tim_width, tim_height, tim_pixel_data, encode=False)
+        if ord_pixel_data is None:
+            return None
 
-        # Write the decoded TIM to file
-        output_file = open(file_path.split(".")[0] + "_EXT.TIM", "wb")
-        output_file.write(
+        return (
             tim_tag + tim_bpp + tim_clut_size + tim_fb_pal_x + tim_fb_pal_y + tim_colors + tim_clut_num +
             cluts + tim_img_size + tim_fb_img_x + tim_fb_img_y + tim_width + tim_height + bytearray(ord_pixel_data)
         )
+
+    return None
+
+
+def do_extract_tim(file_path):
+    print("Extracting {}".format(file_path))
+    # Open TIM file
+    tim_file = open(file_path, "rb").read()
+
+    decoded_tim = do_decode_tim(tim_file)
+
+    if decoded_tim is not None:
+        # Write the decoded TIM to file
+        output_file = open(os.path.splitext(file_path)[0] + "_EXT.TIM", "wb")
+        output_file.write(decoded_tim)
         output_file.close()
 
     elif tim_file[0:4] == b'\x09\x00\x00\x00':
@@ -142,3 +286,33 @@ def do_extract_tim(file_path):
 
     elif tim_file[0:4] == b'\x0A\x00\x00\x00':
         print("CLUT Patch inside TIM file")
+
+
+def do_export_tim_png(file_path):
+    # Convert a MML TIM straight to an indexed PNG next to its _EXT.TIM, with the first CLUT as its palette.
+    # Returns the path of the PNG, or None for the CLUT only types
+    tim_file = open(file_path, "rb").read()
+
+    if tim_file[0:4] != b'\x01\x00\x00\x00' or tim_file[20:22] not in (b'\x10\x00', b'\x00\x01'):
+        return None
+
+    print("Exporting {}".format(file_path))
+    header = 2048  # 0x800
+    tim_colors = bytes_to_uint(tim_file[20:22])
+    tim_width = bytes_to_uint(tim_file[36:40])
+    tim_height = bytes_to_uint(tim_file[40:44])
+
+    ord_pixel_data = do_ord_pixel_data(tim_file[20:22], ulong_to_bytes(tim_width * tim_height * 2 + 12),
+                                       tim_file[36:38], tim_file[40:42], tim_file[header:], encode=False)
+    if ord_pixel_data is None:
+        return None
+
+    # Images not made of whole blocks come back as a list
+    if isinstance(ord_pixel_data, list):
+        ord_pixel_data = bytearray(ord_pixel_data)
+
+    png_path = os.path.splitext(file_path)[0] + "_EXT.PNG"
+    do_write_tim_png(png_path, ord_pixel_data, tim_width * 2, tim_height, tim_colors,
+                     tim_file[256:256 + tim_colors * 2])
+
+    return png_path
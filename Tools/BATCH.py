@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from Formats.BIN import bytes_to_uint, do_get_manifest_path, do_read_index, do_map_file
+from Formats.EXE import do_get_exe_layout, do_get_exe_text_files, do_encode_region_text, do_allocate_region_blocks
+from Formats.EXE import do_get_free_ranges, do_get_free_ranges_path
+from Formats.MSG import do_encode_msg_text, do_load_block_cache, encode_errors
+from Tools.EDITOR import do_get_paths, do_find_edited_file, do_extract_file, do_insert_exe, do_insert_folder
+from Tools.EDITOR import do_get_cache_path, do_export_folder_png
+
+
+def do_find_batch_files(folder_or_glob):
+    # A folder means every BIN inside it plus ROCK_NEO.EXE. The DAT subfolder is included too,
+    # so the root of the disc can be passed directly. Anything else is treated as a glob
+    if os.path.isdir(folder_or_glob):
+        folders = [folder_or_glob, os.path.join(folder_or_glob, "DAT")]
+        candidates = [os.path.join(folder, name) for folder in folders if os.path.isdir(folder)
+                      for name in sorted(os.listdir(folder))]
+    else:
+        candidates = sorted(glob.glob(folder_or_glob))
+
+    return [os.path.normpath(path).replace("\\", "/") for path in candidates if os.path.isfile(path) and
+            (path.upper().endswith(".BIN") or os.path.basename(path) == "ROCK_NEO.EXE")]
+
+
+def do_run_quiet(job, file_name):
+    # Run a single job with its console output captured, so the logs of the workers don't interleave
+    output = io.StringIO()
+    start = time.perf_counter()
+
+    try:
+        with contextlib.redirect_stdout(output):
+            result = job(file_name)
+    # A job that fails in an unexpected way must not take down the whole pool
+    except Exception as e:
+        output.write("\nERROR: {}".format(e))
+        result = None
+
+    return file_name, result, time.perf_counter() - start, output.getvalue()
+
+
+def do_run_batch(job, file_names, workers):
+    results: list = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(do_run_quiet, [job] * len(file_names), file_names):
+            results.append(result)
+
+    return results
+
+
+def do_print_report(results, action, workers, elapsed):
+    failed = 0
+    items = 0
+
+    print("")
+    for file_name, result, seconds, output in results:
+        if result is None:
+            failed += 1
+            # The last line printed by the job tells why it failed
+            lines = [line for line in output.splitlines() if line.strip()]
+            reason = lines[-1] if lines else "Unknown error"
+            print("FAIL  {}  {}".format(file_name, reason))
+        elif result == 0:
+            print("SKIP  {}  Up to date".format(file_name))
+        else:
+            items += result
+            print("OK    {}  {} items in {:.2f}s".format(file_name, result, seconds))
+
+    print("\n{} {} of {} files ({} items) in {:.2f}s using {} workers. {} failed.".format(
+        action, len(results) - failed, len(results), items, elapsed, workers, failed))
+
+    return failed == 0
+
+
+def do_batch_extract(folder_or_glob, workers=None, use_store=False):
+    file_names = do_find_batch_files(folder_or_glob)
+
+    if not file_names:
+        print("\nNo BIN or EXE files found")
+        return False
+
+    workers = workers or os.cpu_count() or 1
+    print("\nExtracting {} files using {} workers...".format(len(file_names), workers))
+
+    start = time.perf_counter()
+    results = do_run_batch(partial(do_extract_file, use_store=use_store), file_names, workers)
+
+    return do_print_report(results, "Extracted", workers, time.perf_counter() - start)
+
+
+def do_find_batch_folders(folder_or_glob):
+    # Same rules as do_find_batch_files, but looking for extracted folders (the ones with an index file)
+    # and for ROCK_NEO.EXE when its TXT file is next to it
+    if os.path.isdir(folder_or_glob):
+        folders = [folder_or_glob, os.path.join(folder_or_glob, "DAT")]
+        candidates = [os.path.join(folder, name) for folder in folders if os.path.isdir(folder)
+                      for name in sorted(os.listdir(folder))]
+    else:
+        candidates = sorted(glob.glob(folder_or_glob))
+
+    found: list = []
+    for path in candidates:
+        path = os.path.normpath(path).replace("\\", "/")
+        index_file_path = do_get_paths(path)[3]
+        if os.path.isdir(path) and (os.path.isfile(do_get_manifest_path(index_file_path)) or
+                                    os.path.isfile(index_file_path)):
+            found.append(path)
+        elif os.path.basename(path) == "ROCK_NEO.EXE" and os.path.isfile(os.path.splitext(path)[0] + ".TXT"):
+            found.append(path)
+
+    return found
+
+
+def do_hash_file(file_path):
+    file_hash = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1048576), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def do_get_build_files(file_or_folder_name):
+    # Get the files a build depends on, the file it creates and where to keep the build stamp
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(
+        file_or_folder_name)
+
+    # The EXE is patched in place from the TXT files of its text regions, and from its free ranges if it has any
+    if file_name_only == "ROCK_NEO.EXE":
+        input_files = do_get_exe_text_files(full_file_or_folder_name, full_path_and_file_no_ext)
+        if os.path.exists(do_get_free_ranges_path(full_path_and_file_no_ext)):
+            input_files.append(do_get_free_ranges_path(full_path_and_file_no_ext))
+        return input_files, full_file_or_folder_name, full_path_and_file_no_ext + ".stamp"
+
+    folder_path = index_file_path.replace(os.path.basename(index_file_path), "")
+    # The manifest, or the TXT index of folders extracted by older versions
+    manifest_path = do_get_manifest_path(index_file_path)
+    input_files: list = [manifest_path if os.path.exists(manifest_path) else index_file_path]
+
+    # MSG, TIM and FONT files get rewritten by the insertion, so their edited files are the real inputs
+    for bin_entry in do_read_index(index_file_path) or []:
+        file_name = bin_entry.path.upper()
+        edited_file = do_find_edited_file(folder_path, file_name)
+        if edited_file is not None:
+            input_files.append(folder_path + edited_file)
+        else:
+            input_files.append(folder_path + file_name)
+
+    stamp_file = "{}/{}.stamp".format(full_file_or_folder_name, file_name_only)
+
+    return input_files, "{}.BIN".format(full_file_or_folder_name), stamp_file
+
+
+def do_read_stamp(stamp_file):
+    if not os.path.exists(stamp_file):
+        return None
+    try:
+        return json.load(open(stamp_file, "r"))
+    except ValueError:
+        return None
+
+
+def do_get_file_state(file_path, old_state=None):
+    # Files with the same time and size as in the old stamp are not hashed again
+    stat = os.stat(file_path)
+    if old_state is not None and old_state[0] == stat.st_mtime_ns and old_state[1] == stat.st_size:
+        return old_state
+    return [stat.st_mtime_ns, stat.st_size, do_hash_file(file_path)]
+
+
+def do_check_stamp(stamp, input_files, output_file):
+    # Returns the new state of the inputs, and whether the output has to be built again
+    old_inputs = stamp["inputs"] if stamp else {}
+    new_inputs: dict = {}
+    stale = stamp is None or set(old_inputs) != set(input_files)
+
+    for input_file in input_files:
+        if not os.path.exists(input_file):
+            stale = True
+            continue
+        new_inputs[input_file] = do_get_file_state(input_file, old_inputs.get(input_file))
+        # A file that was only touched still has the same hash, so it doesn't count as changed
+        if not stale and new_inputs[input_file][2] != old_inputs[input_file][2]:
+            stale = True
+
+    # The output must still be the one this tool built
+    if not stale:
+        if not os.path.exists(output_file):
+            stale = True
+        else:
+            stat = os.stat(output_file)
+            stale = [stat.st_mtime_ns, stat.st_size] != stamp["output"]
+
+    return new_inputs, stale
+
+
+def do_write_stamp(stamp_file, inputs, output_file):
+    stat = os.stat(output_file)
+    json.dump({"inputs": inputs, "output": [stat.st_mtime_ns, stat.st_size]}, open(stamp_file, "w"), indent=1)
+
+
+def do_stamp_file(file_or_folder_name):
+    # Mark an output as built from its current inputs, for outputs known to match them.
+    # Ex: BIN files just copied from a disc image and extracted, which -bi may then replace
+    input_files, output_file, stamp_file = do_get_build_files(file_or_folder_name)
+
+    if not os.path.exists(output_file) or not all(os.path.exists(input_file) for input_file in input_files):
+        return False
+
+    do_write_stamp(stamp_file, {input_file: do_get_file_state(input_file) for input_file in input_files}, output_file)
+    return True
+
+
+def do_rebuild_file(file_or_folder_name):
+    input_files, output_file, stamp_file = do_get_build_files(file_or_folder_name)
+    stamp = do_read_stamp(stamp_file)
+
+    inputs, stale = do_check_stamp(stamp, input_files, output_file)
+
+    if not stale:
+        print("\n{} is up to date".format(output_file))
+        # Save the new times, so touched files are not hashed again next time
+        if inputs != stamp["inputs"]:
+            do_write_stamp(stamp_file, inputs, output_file)
+        return 0
+
+    if output_file.endswith("ROCK_NEO.EXE"):
+        result = do_insert_exe(file_or_folder_name)
+    # Only BIN files built by this tool are replaced. Original ones must still be moved away first
+    elif os.path.exists(output_file) and stamp is None:
+        print("\nBIN file already exists. Please delete or move/delete before creation.")
+        return None
+    else:
+        result = do_insert_folder(file_or_folder_name, overwrite=True)
+
+    if result is not None:
+        # Inputs may have been rewritten by the insertion, so read their state again
+        do_write_stamp(stamp_file, {input_file: do_get_file_state(input_file, inputs.get(input_file))
+                                    for input_file in input_files}, output_file)
+
+    return result
+
+
+def do_batch_insert(folder_or_glob, workers=None):
+    file_names = do_find_batch_folders(folder_or_glob)
+
+    if not file_names:
+        print("\nNo extracted folders or EXE files found")
+        return False
+
+    workers = workers or os.cpu_count() or 1
+    print("\nInserting {} folders using {} workers...".format(len(file_names), workers))
+
+    start = time.perf_counter()
+    results = do_run_batch(do_rebuild_file, file_names, workers)
+
+    return do_print_report(results, "Inserted", workers, time.perf_counter() - start)
+
+
+def do_batch_export_png(folder_or_glob, workers=None):
+    file_names = [file_name for file_name in do_find_batch_folders(folder_or_glob)
+                  if os.path.basename(file_name) != "ROCK_NEO.EXE"]
+
+    if not file_names:
+        print("\nNo extracted folders found")
+        return False
+
+    workers = workers or os.cpu_count() or 1
+    print("\nExporting the images of {} folders using {} workers...".format(len(file_names), workers))
+
+    start = time.perf_counter()
+    results = do_run_batch(do_export_folder_png, file_names, workers)
+
+    return do_print_report(results, "Exported", workers, time.perf_counter() - start)
+
+
+def do_check_file(file_or_folder_name):
+    # Encode the TXT files of an extracted folder, or of ROCK_NEO.EXE, without writing anything.
+    # Returns (TXT file, encoded size, size limit, note) for each one. The size is None if the text can't be encoded
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(
+        file_or_folder_name)
+
+    # Blocks encoded by the last insertion are read from its cache, which is left as it was
+    block_cache = do_load_block_cache(do_get_cache_path(file_or_folder_name))
+
+    if file_name_only == "ROCK_NEO.EXE":
+        f_data = do_map_file(full_file_or_folder_name)
+        exe_layout = do_get_exe_layout(f_data)
+        if not isinstance(f_data, bytes):
+            f_data.close()
+        if exe_layout is None:
+            print("\nNot a valid NTSC MML PSX EXE file")
+            return None
+
+        rows: list = []
+        # The limit of each region includes what's left of the free areas after the regions before it
+        free_areas = [[range_start, range_start, range_end]
+                      for range_start, range_end in do_get_free_ranges(exe_layout, full_path_and_file_no_ext)]
+        for region in exe_layout.regions:
+            text_file = full_path_and_file_no_ext + region.text_file
+            size_limit = region.data_end - region.data_start + sum(area[2] - area[1] for area in free_areas)
+            free_used = sum(area[1] - area[0] for area in free_areas)
+
+            try:
+                encoded_block = do_encode_region_text(open(text_file, "r").read(), region, block_cache)
+            except FileNotFoundError:
+                rows.append((text_file, None, size_limit, "TXT file missing"))
+                continue
+            except encode_errors as e:
+                rows.append((text_file, None, size_limit, "Can't be encoded: {!r}".format(e)))
+                continue
+
+            if do_allocate_region_blocks(encoded_block, region, free_areas) is None:
+                note = "Blocks don't fit in the free areas"
+            elif sum(area[1] - area[0] for area in free_areas) > free_used:
+                note = "{} bytes placed in the free areas".format(sum(area[1] - area[0] for area in free_areas) -
+                                                                  free_used)
+            else:
+                note = ""
+            rows.append((text_file, sum(len(encoded_text_block) for encoded_text_block in encoded_block), size_limit,
+                         note))
+        return rows
+
+    bin_entries = do_read_index(index_file_path)
+    if bin_entries is None:
+        print("\nIndex file missing")
+        return None
+
+    folder_path = index_file_path.replace(os.path.basename(index_file_path), "")
+    rows: list = []
+
+    for bin_entry in bin_entries:
+        msg_file_path = folder_path + bin_entry.path
+        text_file = msg_file_path + ".txt"
+        if not bin_entry.path.upper().endswith(".MSG") or not os.path.exists(text_file):
+            continue
+
+        # Same limits as do_insert_msg: the data after the 0x800 header must fit in the current MSG file
+        with open(msg_file_path, "rb") as msg_file:
+            msg_header = msg_file.read(2050)
+        size_limit = os.path.getsize(msg_file_path) - 2048
+
+        try:
+            ptr_table, encoded_block_bytes, saved_size = do_encode_msg_text(
+                open(text_file, "r").read(), bytes_to_uint(msg_header[2048:2050]), bytes_to_uint(msg_header[4:8]),
+                size_limit, block_cache)
+        except encode_errors as e:
+            rows.append((text_file, None, size_limit, "Can't be encoded: {!r}".format(e)))
+            continue
+
+        rows.append((text_file, len(ptr_table) * 2 + len(encoded_block_bytes), size_limit,
+                     "Identical blocks shared, saving {} bytes".format(saved_size) if saved_size else ""))
+
+    return rows
+
+
+def do_batch_check(folder_or_glob, workers=None):
+    file_names = do_find_batch_folders(folder_or_glob)
+
+    if not file_names:
+        print("\nNo extracted folders or EXE files found")
+        return False
+
+    workers = workers or os.cpu_count() or 1
+    print("\nChecking {} folders using {} workers...".format(len(file_names), workers))
+
+    start = time.perf_counter()
+    results = do_run_batch(do_check_file, file_names, workers)
+
+    rows: list = []
+    failed = 0
+    print("")
+    for file_name, result, seconds, output in results:
+        if result is None:
+            failed += 1
+            lines = [line for line in output.splitlines() if line.strip()]
+            print("FAIL  {}  {}".format(file_name, lines[-1] if lines else "Unknown error"))
+        else:
+            rows.extend(result)
+
+    # The files that can't be encoded go first, then the ones with less free space
+    rows.sort(key=lambda row: (row[1] is not None, row[2] - row[1] if row[1] is not None else 0))
+
+    print("{:>8}  {:>8}  {:>8}  {:>6}  {}".format("Size", "Limit", "Free", "Used", "File"))
+    for text_file, size, size_limit, note in rows:
+        if size is None:
+            print("{:>8}  {:>8}  {:>8}  {:>6}  {}  {}".format("-", size_limit, "-", "-", text_file, note))
+        else:
+            print("{:>8}  {:>8}  {:>8}  {:>5.1f}%  {}{}".format(
+                size, size_limit, size_limit - size, size * 100 / size_limit if size_limit else 100, text_file,
+                "  " + note if note else ""))
+
+    over_limit = sum(1 for text_file, size, size_limit, note in rows if size is None or size > size_limit)
+
+    print("\nChecked {} files in {:.2f}s using {} workers. {} over the limit or not encodable. {} failed.".format(
+        len(rows), time.perf_counter() - start, workers, over_limit, failed))
+
+    return over_limit == 0 and failed == 0
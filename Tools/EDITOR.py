@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+import json
+import os
+
+from Formats.BIN import do_map_file, do_list_bin, do_unpack_bin, do_pack_bin, do_patch_bin
+from Formats.BIN import do_unshare_file, do_get_manifest_path, do_read_index, do_verify_bin
+from Formats.EXE import do_extract_exe_text, do_insert_exe_text
+from Formats.FONT import do_extract_font, do_insert_font, do_export_font_png
+from Formats.MSG import do_extract_msg, do_insert_msg, do_load_block_cache, do_save_block_cache
+from Formats.TIM import do_extract_tim, do_insert_tim, do_export_tim_png
+
+
+def do_get_paths(file_or_folder_name):
+    # Replace \ with / since Windows is compatible but not Linux or Mac
+    # Ex: TEST\TEST2\FILE.BIN or TEST\TEST2 == TEST/TEST2/FILE.BIN or TEST/TEST2
+    full_file_or_folder_name: str = file_or_folder_name.replace("\\", "/")
+    # Get only the paths from the normalized path
+    # Ex: TEST/TEST2/FILE.BIN == TEST/TEST2/FILE
+    full_path_and_file_no_ext = os.path.splitext(full_file_or_folder_name)[0]
+    # Get only the file name from the normalized path
+    # Ex: TEST/TEST2/FILE.BIN == FILE.BIN
+    file_name_only = os.path.basename(full_file_or_folder_name)
+    # Full path to the index file
+    # Ex: TEST/TEST2/TEST2.BIN == TEST/TEST2/TEST2.txt
+    index_file_path = "{}/{}.txt".format(full_path_and_file_no_ext, file_name_only.replace(".BIN", ""))
+
+    return full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path
+
+
+def do_list_file(file_name):
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(file_name)
+
+    file_data = do_map_file(full_file_or_folder_name)
+
+    if file_data[64:67] != b"..\\":
+        print("\nNot a valid MML PSX BIN file")
+        return None
+
+    return do_list_bin(file_data)
+
+
+def do_extract_exe(file_name):
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(file_name)
+
+    return do_extract_exe_text(full_file_or_folder_name, full_path_and_file_no_ext)
+
+
+def do_get_store_folder(file_name):
+    # The shared store lives next to the BIN files, so every archive of the same folder uses it
+    return "{}/_STORE".format(os.path.dirname(os.path.abspath(file_name)).replace("\\", "/"))
+
+
+def do_get_source_path(index_file_path):
+    # Hash of each block of the MSG files of a folder as they were extracted, for the translation memory.
+    # Ex: DAT/ST00/ST00.source
+    return os.path.splitext(index_file_path)[0] + ".source"
+
+
+def do_read_source_blocks(index_file_path):
+    # The block hashes of each MSG file by its path in the folder. Folders extracted by older versions have none
+    source_path = do_get_source_path(index_file_path)
+    if not os.path.exists(source_path):
+        return {}
+    try:
+        return json.load(open(source_path, "r"))
+    except ValueError:
+        return {}
+
+
+def do_extract_bin(file_name, use_store=False):
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(file_name)
+
+    # Map the file instead of reading it so big archives don't have to fit in memory
+    file_data = do_map_file(full_file_or_folder_name)
+
+    # Check if the file is a valid MML BIN file
+    try:
+        assert file_data[64:67].decode() == "..\\"
+    except AssertionError:
+        print("\nNot a valid MML PSX BIN file")
+        return None
+
+    # Create index file
+    if not os.path.exists(full_path_and_file_no_ext):
+        os.mkdir(full_path_and_file_no_ext)
+
+    # Proceed with extraction
+    bin_entries = do_unpack_bin(full_path_and_file_no_ext, file_data, do_get_manifest_path(index_file_path),
+                                do_get_store_folder(file_name) if use_store else None)
+
+    # Decode the extracted files straight from the table of entries
+    source_blocks: dict = {}
+    for bin_entry in bin_entries:
+        file_path = index_file_path.replace(os.path.basename(index_file_path), "") + bin_entry.path
+        # If MSG files are found, extract them
+        if any(fn in bin_entry.path.upper() for fn in [".MSG"]):
+            source_blocks[bin_entry.path] = do_extract_msg(file_path)
+        # If TIM files are found, extract them
+        elif any(fn in bin_entry.path.upper() for fn in [".TIM"]):
+            do_extract_tim(file_path)
+        # If FONT files are found, extract them
+        elif any(fn in bin_entry.path.upper() for fn in ("FONT.DAT", "KAIFONT.DAT")):
+            do_extract_font(file_path)
+
+    json.dump(source_blocks, open(do_get_source_path(index_file_path), "w"))
+
+    return len(bin_entries)
+
+
+def do_extract_file(file_name, use_store=False):
+    if os.path.basename(file_name.replace("\\", "/")) == "ROCK_NEO.EXE":
+        return do_extract_exe(file_name)
+    else:
+        return do_extract_bin(file_name, use_store)
+
+
+def do_get_cache_path(file_or_folder_name):
+    # Encoded blocks of the TXT files of a folder, or of ROCK_NEO.EXE, kept between insertions.
+    # Ex: DAT/ST00/ST00.cache or ROCK_NEO.cache
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(
+        file_or_folder_name)
+    if file_name_only == "ROCK_NEO.EXE":
+        return full_path_and_file_no_ext + ".cache"
+    return os.path.splitext(index_file_path)[0] + ".cache"
+
+
+def do_insert_exe(file_name):
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(file_name)
+
+    cache_path = do_get_cache_path(file_name)
+    block_cache = do_load_block_cache(cache_path)
+    block_count = do_insert_exe_text(full_file_or_folder_name, full_path_and_file_no_ext, block_cache)
+    # Keep the cache as it was if nothing was inserted
+    if block_count is not None:
+        do_save_block_cache(cache_path, block_cache)
+
+    return block_count
+
+
+def do_get_edited_file(file_name):
+    # Get the name of the editable file that was extracted from an inner file.
+    # Files without one are inserted as is, so None is returned for those
+    if any(fn in file_name.upper() for fn in [".MSG"]):
+        return file_name + ".txt"
+    elif any(fn in file_name.upper() for fn in [".TIM"]):
+        return file_name.replace(".TIM", "_EXT.TIM")
+    elif any(fn in file_name.upper() for fn in ("FONT.DAT", "KAIFONT.DAT")):
+        return file_name.replace(".DAT", ".TIM")
+    return None
+
+
+def do_find_edited_file(folder_path, file_name):
+    # Get the edited file of an inner file if it's in the folder, or None.
+    # The PNG exported from a TIM or FONT is used instead of its TIM when there is one
+    edited_file = do_get_edited_file(file_name)
+    if edited_file is None:
+        return None
+    if edited_file.upper().endswith(".TIM") and os.path.exists(folder_path + edited_file[:-4] + ".PNG"):
+        return edited_file[:-4] + ".PNG"
+    return edited_file if os.path.exists(folder_path + edited_file) else None
+
+
+def do_insert_edited_files(index_file_path, bin_entries, changed_files=None):
+    # Insert the edited files of a folder into their original files.
+    # With changed_files, only the edited files in it are inserted again.
+    # Returns False if some file couldn't be inserted, after trying all of them
+    folder_path = index_file_path.replace(os.path.basename(index_file_path), "")
+    # Blocks that didn't change since the last insertion are taken from the cache instead of encoded again
+    cache_path = os.path.splitext(index_file_path)[0] + ".cache"
+    block_cache = do_load_block_cache(cache_path)
+    inserted = True
+
+    for bin_entry in bin_entries:
+        file_name = bin_entry.path.upper()
+        original_file = folder_path + file_name
+        edited_file = do_find_edited_file(folder_path, file_name)
+
+        if edited_file is None or not os.path.exists(original_file):
+            continue
+        if changed_files is not None and folder_path + edited_file not in changed_files:
+            continue
+
+        # The original file is changed in place, so it can't stay linked to the store
+        do_unshare_file(original_file)
+
+        # If any MSG file is found. Insert TXT into MSG
+        if any(fn in file_name for fn in [".MSG"]):
+            if do_insert_msg(original_file, folder_path + edited_file, block_cache) is None:
+                inserted = False
+        # If any TIM file is found. Insert TIM into original TIM
+        elif any(fn in file_name for fn in [".TIM"]):
+            if do_insert_tim(original_file, folder_path + edited_file) is None:
+                inserted = False
+        # If FONT file is found. Insert FONT into original FONT
+        elif any(fn in file_name for fn in ("FONT.DAT", "KAIFONT.DAT")):
+            if do_insert_font(original_file, folder_path + edited_file) is None:
+                inserted = False
+
+    # Keep the cache as it was if something failed
+    if inserted:
+        do_save_block_cache(cache_path, block_cache)
+    else:
+        print("\nERROR: Some files couldn't be inserted. See the errors above.")
+
+    return inserted
+
+
+def do_export_folder_png(folder_name):
+    # Convert every TIM and FONT file of an extracted folder to PNG. Returns the amount of PNG files written
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(folder_name)
+
+    if file_name_only == "ROCK_NEO.EXE":
+        return 0
+
+    bin_entries = do_read_index(index_file_path)
+    if bin_entries is None:
+        print("\nIndex file missing")
+        return None
+
+    folder_path = index_file_path.replace(os.path.basename(index_file_path), "")
+    exported = 0
+
+    for bin_entry in bin_entries:
+        file_name = bin_entry.path.upper()
+        if not os.path.exists(folder_path + file_name):
+            continue
+
+        if any(fn in file_name for fn in [".TIM"]):
+            exported += do_export_tim_png(folder_path + file_name) is not None
+        elif any(fn in file_name for fn in ("FONT.DAT", "KAIFONT.DAT")):
+            exported += do_export_font_png(folder_path + file_name) is not None
+
+    return exported
+
+
+def do_insert_folder(folder_name, overwrite=False):
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(folder_name)
+
+    bin_entries = do_read_index(index_file_path)
+    if bin_entries is None:
+        print("\nIndex file missing")
+        return None
+    elif os.path.exists("{}.BIN".format(full_file_or_folder_name)) and not overwrite:
+        print("\nBIN file already exists. Please delete or move/delete before creation.")
+        return None
+
+    if not do_insert_edited_files(index_file_path, bin_entries):
+        return None
+
+    if not overwrite:
+        if not do_pack_bin(full_file_or_folder_name, bin_entries):
+            return None
+    else:
+        # Pack to a temporary file first, so a failed build never leaves a broken BIN behind
+        temp_bin = "{}.BIN.tmp".format(full_file_or_folder_name)
+        if os.path.exists(temp_bin):
+            os.remove(temp_bin)
+        if not do_pack_bin(full_file_or_folder_name, bin_entries, temp_bin):
+            return None
+        os.replace(temp_bin, "{}.BIN".format(full_file_or_folder_name))
+
+    return len(bin_entries)
+
+
+def do_update_folder(folder_name, changed_files=None):
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(folder_name)
+    bin_file_name = "{}.BIN".format(full_file_or_folder_name)
+
+    bin_entries = do_read_index(index_file_path)
+    if bin_entries is None:
+        print("\nIndex file missing")
+        return None
+    elif not os.path.exists(bin_file_name):
+        print("\nBIN file missing. Use -i to create it.")
+        return None
+
+    if not do_insert_edited_files(index_file_path, bin_entries, changed_files):
+        return None
+
+    # Patch the changed sectors in place. Every file must still fit its slot, so the BIN is never laid out again
+    print("\nUpdating {} file...".format(bin_file_name))
+    if do_patch_bin(full_file_or_folder_name, bin_entries, bin_file_name) is None:
+        return None
+
+    return len(bin_entries)
+
+
+def do_verify_folder(folder_name):
+    full_file_or_folder_name, full_path_and_file_no_ext, file_name_only, index_file_path = do_get_paths(folder_name)
+
+    bin_entries = do_read_index(index_file_path)
+    if bin_entries is None:
+        print("\nIndex file missing")
+        return None
+
+    print("\nVerifying {}".format(full_file_or_folder_name))
+    if not do_verify_bin(full_file_or_folder_name, bin_entries):
+        return None
+
+    return len(bin_entries)
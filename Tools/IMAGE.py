@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import os
+
+from Formats.ISO import do_map_image, do_scan_image, do_read_sectors, do_write_image_file
+from Tools.BATCH import do_batch_extract, do_batch_insert, do_stamp_file
+
+
+def do_get_image_folder(image_name):
+    # Files of the disc are kept in a folder with the name of the image
+    # Ex: TEST/MML.BIN == TEST/MML, with TEST/MML/DAT/ST00.BIN and TEST/MML/ROCK_NEO.EXE
+    return os.path.splitext(image_name.replace("\\", "/"))[0]
+
+
+def do_find_image_files(files):
+    # The BIN files of the DAT folder and ROCK_NEO.EXE, the only ones DashEditor knows how to edit
+    return [image_file for path, image_file in sorted(files.items()) if path == "ROCK_NEO.EXE" or
+            (path.startswith("DAT/") and path.endswith(".BIN") and path.count("/") == 1)]
+
+
+def do_open_image(image_name, write=False):
+    f_data = do_map_image(image_name, write)
+    layout, files = do_scan_image(f_data)
+
+    if files is None:
+        f_data.close()
+        print("\nNot a valid ISO-9660 disc image")
+        return None, None, None
+
+    return f_data, layout, do_find_image_files(files)
+
+
+def do_extract_image(image_name, workers=None):
+    f_data, layout, image_files = do_open_image(image_name)
+    if f_data is None:
+        return False
+
+    image_folder = do_get_image_folder(image_name)
+    print("\nCopying {} files from {} to {}".format(len(image_files), image_name, image_folder))
+
+    # Copy the files straight from the sectors of the image
+    for image_file in image_files:
+        file_path = "{}/{}".format(image_folder, image_file.path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as output_file:
+            output_file.write(do_read_sectors(f_data, layout, image_file.lba, image_file.size))
+
+    f_data.close()
+
+    result = do_batch_extract(image_folder, workers)
+
+    # The copies are the same as the files on the disc, so -bi doesn't need to build them again
+    # until something is edited, and may replace them without moving them away first
+    for image_file in image_files:
+        file_path = "{}/{}".format(image_folder, image_file.path)
+        do_stamp_file(file_path if image_file.path == "ROCK_NEO.EXE" else os.path.splitext(file_path)[0])
+
+    return result
+
+
+def do_insert_image(image_name, workers=None):
+    image_folder = do_get_image_folder(image_name)
+
+    if not os.path.isdir(image_folder):
+        print("\nFolder {} not found. Extract the image first".format(image_folder))
+        return False
+
+    # Build the changed files first, then write back only the sectors that differ from the image
+    result = do_batch_insert(image_folder, workers)
+
+    f_data, layout, image_files = do_open_image(image_name, write=True)
+    if f_data is None:
+        return False
+
+    print("\nUpdating {}".format(image_name))
+    total_written = 0
+
+    for image_file in image_files:
+        file_path = "{}/{}".format(image_folder, image_file.path)
+        if not os.path.exists(file_path):
+            continue
+
+        written = do_write_image_file(f_data, layout, image_file, open(file_path, "rb").read())
+        if written is None:
+            result = False
+        elif written:
+            print("{}: {} sectors written".format(image_file.path, written))
+            total_written += written
+
+    f_data.flush()
+    f_data.close()
+
+    print("\nWrote {} sectors to {}".format(total_written, image_name))
+
+    return result
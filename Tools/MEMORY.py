@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import time
+
+from Formats.BIN import do_map_file, do_read_index
+from Formats.MSG import do_iter_msg_block_data, do_split_text_blocks, do_replace_text_blocks, do_encode_text_block
+from Formats.MSG import encode_errors
+from Tools.BATCH import do_find_batch_folders
+from Tools.EDITOR import do_get_paths, do_read_source_blocks
+
+# Version of the translation memory file. Change it whenever its fields change, or to index every file again
+MEMORY_VERSION = 2
+
+
+def do_get_memory_path(folder_name):
+    return os.path.join(folder_name, "_MEMORY.json")
+
+
+def do_hash_block(block_data):
+    return hashlib.sha1(block_data).hexdigest()
+
+
+def do_find_msg_text_files(folder_name):
+    # The MSG files of every extracted folder in the tree, as (MSG path, TXT path, manifest hash, source hashes).
+    # Source hashes are the ones of the blocks at extraction, or None for folders extracted by older versions
+    msg_files: list = []
+
+    for bin_folder in do_find_batch_folders(folder_name):
+        index_file_path = do_get_paths(bin_folder)[3]
+        folder_path = index_file_path.replace(os.path.basename(index_file_path), "")
+        source_blocks = do_read_source_blocks(index_file_path)
+        for bin_entry in do_read_index(index_file_path) or []:
+            if bin_entry.path.upper().endswith(".MSG"):
+                msg_files.append((folder_path + bin_entry.path, folder_path + bin_entry.path + ".txt",
+                                  bin_entry.hash, source_blocks.get(bin_entry.path)))
+
+    return msg_files
+
+
+def do_hash_msg_source(msg_path, manifest_hash):
+    # Hash of each block of a MSG file, if it's still the one extracted. Once something is inserted it holds the
+    # translated text, so the file is skipped unless its hash is the one in the manifest
+    msg_file = do_map_file(msg_path)
+
+    if manifest_hash is None or hashlib.sha1(msg_file).hexdigest() != manifest_hash:
+        print("{} changed since extraction. Extract it again to index it".format(msg_path))
+        source = None
+    else:
+        source = [do_hash_block(block_data) for _, _, _, block_data in do_iter_msg_block_data(msg_file)]
+
+    if not isinstance(msg_file, bytes):
+        msg_file.close()
+
+    return source
+
+
+def do_hash_text_blocks(text_file):
+    # Hash of each block of a TXT file once encoded, without the 0x0000 at the end, so it compares with the MSG data.
+    # Blocks that can't be encoded get None
+    text_hashes: list = []
+    for text_block in do_split_text_blocks(open(text_file, "r").read()):
+        try:
+            text_hashes.append(do_hash_block(bytes(do_encode_text_block(text_block)[0:-2])))
+        except encode_errors:
+            text_hashes.append(None)
+    return text_hashes
+
+
+def do_update_memory(folder_name):
+    # Read the translation memory of a tree and bring it up to date. For every TXT file it keeps:
+    # source: hash of each block of the MSG file as it was extracted
+    # text: hash of each block of the TXT file, only computed again when the TXT file changed
+    memory_path = do_get_memory_path(folder_name)
+    memory = {"version": MEMORY_VERSION, "files": {}}
+
+    if os.path.exists(memory_path):
+        try:
+            old_memory = json.load(open(memory_path, "r"))
+            if old_memory.get("version") == MEMORY_VERSION:
+                memory = old_memory
+        except ValueError:
+            pass
+
+    updated = 0
+    files: dict = {}
+
+    for msg_path, text_path, manifest_hash, source in do_find_msg_text_files(folder_name):
+        if not os.path.exists(text_path):
+            continue
+
+        location = os.path.relpath(text_path, folder_name).replace("\\", "/")
+        memory_file = memory["files"].get(location)
+        stat = os.stat(text_path)
+        text_state = [stat.st_mtime_ns, stat.st_size]
+
+        # The MSG file is changed by the insertion, so the source blocks are taken from the extraction
+        if memory_file is None:
+            if source is None:
+                source = do_hash_msg_source(msg_path, manifest_hash)
+                if source is None:
+                    continue
+            memory_file = {"source": source, "text_state": None, "text": []}
+
+        if memory_file["text_state"] != text_state:
+            memory_file["text"] = do_hash_text_blocks(text_path)
+            memory_file["text_state"] = text_state
+            updated += 1
+
+        files[location] = memory_file
+
+    # Files that are gone from the tree are dropped
+    memory["files"] = files
+    json.dump(memory, open(memory_path, "w"))
+
+    return memory, updated
+
+
+def do_group_blocks(memory):
+    # Invert the memory: hash of each source block to all the places it's used, as (TXT file, block number)
+    source_blocks: dict = {}
+    for location, memory_file in sorted(memory["files"].items()):
+        for block_num, source_hash in enumerate(memory_file["source"]):
+            source_blocks.setdefault(source_hash, []).append((location, block_num))
+    return source_blocks
+
+
+def do_get_translations(memory, locations):
+    # Split the places a source block is used in the translated ones, by their text hash, the untranslated ones
+    # and the ones with errors: blocks that can't be encoded, or missing from a TXT file with fewer blocks
+    translations: dict = {}
+    untranslated: list = []
+    errors: list = []
+
+    for location, block_num in locations:
+        memory_file = memory["files"][location]
+        text_hash = memory_file["text"][block_num] if block_num < len(memory_file["text"]) else None
+        if text_hash is None:
+            errors.append((location, block_num))
+        elif text_hash == memory_file["source"][block_num]:
+            untranslated.append((location, block_num))
+        else:
+            translations.setdefault(text_hash, []).append((location, block_num))
+
+    return translations, untranslated, errors
+
+
+def do_report_memory(folder_name):
+    start = time.perf_counter()
+    memory, updated = do_update_memory(folder_name)
+    source_blocks = do_group_blocks(memory)
+
+    duplicates = {source_hash: locations for source_hash, locations in source_blocks.items() if len(locations) > 1}
+    block_count = sum(len(locations) for locations in source_blocks.values())
+
+    print("\nIndexed {} blocks in {} MSG files ({} updated) in {:.2f}s".format(
+        block_count, len(memory["files"]), updated, time.perf_counter() - start))
+    print("{} blocks are used more than once, in {} places".format(
+        len(duplicates), sum(len(locations) for locations in duplicates.values())))
+    print("{} blocks are missing or can't be encoded\n".format(
+        sum(len(do_get_translations(memory, locations)[2]) for locations in source_blocks.values())))
+
+    for source_hash, locations in sorted(duplicates.items(), key=lambda item: -len(item[1])):
+        translations, untranslated, errors = do_get_translations(memory, locations)
+        if not translations:
+            status = "Untranslated"
+        elif len(translations) > 1:
+            status = "CONFLICT: {} different translations".format(len(translations))
+        elif untranslated:
+            status = "Partially translated"
+        else:
+            status = "Translated"
+        if errors:
+            status += ". ERROR: {} blocks missing or can't be encoded".format(len(errors))
+
+        print("{:>4} uses  {}".format(len(locations), status))
+        for location, block_num in locations:
+            if (location, block_num) in errors:
+                mark = " ERROR"
+            elif (location, block_num) in untranslated:
+                mark = ""
+            else:
+                mark = " *"
+            print("      {} block {:02X}{}".format(location, block_num, mark))
+
+    return duplicates
+
+
+def do_propagate_memory(folder_name):
+    # Copy the translation of a block to every untranslated place using the same source block.
+    # Blocks with different translations are left alone and reported. Blocks with errors are never copied
+    memory, updated = do_update_memory(folder_name)
+    new_text_blocks: dict = {}
+    conflicts = 0
+    error_blocks: list = []
+
+    for source_hash, locations in do_group_blocks(memory).items():
+        translations, untranslated, errors = do_get_translations(memory, locations)
+        error_blocks += errors
+        if len(translations) > 1:
+            conflicts += 1
+            continue
+        if not translations or not untranslated:
+            continue
+
+        location, block_num = list(translations.values())[0][0]
+        text_path = os.path.join(folder_name, location)
+        translated_text = list(do_split_text_blocks(open(text_path, "r").read()))[block_num]
+
+        for untranslated_location, untranslated_block_num in untranslated:
+            new_text_blocks.setdefault(untranslated_location, {})[untranslated_block_num] = translated_text
+
+    for location, text_blocks in sorted(new_text_blocks.items()):
+        text_path = os.path.join(folder_name, location)
+        text = do_replace_text_blocks(open(text_path, "r").read(), text_blocks)
+        with open(text_path, "w") as text_file:
+            text_file.write(text)
+        print("{}: {} blocks translated".format(location, len(text_blocks)))
+
+    for location, block_num in sorted(error_blocks):
+        print("ERROR: {} block {:02X} is missing or can't be encoded".format(location, block_num))
+
+    # Index the changed TXT files again
+    do_update_memory(folder_name)
+
+    print("\nTranslated {} blocks in {} files. {} blocks with conflicting translations were skipped. "
+          "{} blocks have errors.".format(sum(len(text_blocks) for text_blocks in new_text_blocks.values()),
+                                          len(new_text_blocks), conflicts, len(error_blocks)))
+
+    return len(new_text_blocks)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import ctypes
+import os
+import select
+import sys
+import time
+
+from Tools.BATCH import do_get_build_files, do_read_stamp, do_get_file_state, do_write_stamp
+from Tools.EDITOR import do_get_paths, do_insert_exe, do_update_folder
+
+# Seconds between checks when inotify can't be used
+POLL_INTERVAL = 0.2
+# Seconds without new changes before updating. Editors often write a file more than once when saving
+DEBOUNCE = 0.3
+
+# inotify events: file closed after writing, moved in (editors saving to a temporary file first), created, deleted
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+
+
+def do_open_inotify(folders):
+    # Get an inotify file descriptor watching the folders, or None where inotify isn't available
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        # IN_NONBLOCK has the same value as O_NONBLOCK
+        watch_fd = ctypes.CDLL(None, use_errno=True).inotify_init1(os.O_NONBLOCK)
+    except (OSError, AttributeError):
+        return None
+    if watch_fd < 0:
+        return None
+
+    if not do_add_inotify_watches(watch_fd, folders):
+        os.close(watch_fd)
+        return None
+
+    return watch_fd
+
+
+def do_add_inotify_watches(watch_fd, folders):
+    # Watch more folders with an inotify file descriptor. Watching a folder twice is fine.
+    # Returns False if one of them can't be watched
+    libc = ctypes.CDLL(None, use_errno=True)
+    for folder in folders:
+        if libc.inotify_add_watch(watch_fd, os.fsencode(folder),
+                                  IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE) < 0:
+            return False
+    return True
+
+
+def do_wait_changes(watch_fd, timeout):
+    # Wait until something happened in the watched folders, or just sleep when polling.
+    # Which files changed is found by comparing their state, so the events themselves are thrown away
+    if watch_fd is None:
+        time.sleep(timeout)
+        return
+
+    readable, _, _ = select.select([watch_fd], [], [], timeout)
+    if readable:
+        try:
+            while os.read(watch_fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+
+def do_get_states(input_files):
+    states: dict = {}
+    for input_file in input_files:
+        try:
+            stat = os.stat(input_file)
+            states[input_file] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            states[input_file] = None
+    return states
+
+
+def do_watch_update(file_or_folder_name, changed_files):
+    # Insert the changed files and patch the BIN, or the EXE. Errors are printed, so watching goes on
+    input_files, output_file, stamp_file = do_get_build_files(file_or_folder_name)
+    start = time.perf_counter()
+
+    try:
+        if output_file.endswith("ROCK_NEO.EXE"):
+            result = do_insert_exe(file_or_folder_name)
+        else:
+            result = do_update_folder(file_or_folder_name, changed_files)
+    # Errors in the text are printed by the insertion. Files can still be moved or locked by the editor while saving
+    except OSError as e:
+        print("\nERROR: {}".format(e))
+        result = None
+
+    if result is None:
+        print("\nUpdate of {} failed. Waiting for the next change...".format(output_file))
+        return None
+
+    # Keep the build stamp of -bi up to date, so the next batch insertion doesn't build it again
+    stamp = do_read_stamp(stamp_file)
+    if stamp is not None and all(os.path.exists(input_file) for input_file in input_files):
+        do_write_stamp(stamp_file, {input_file: do_get_file_state(input_file, stamp["inputs"].get(input_file))
+                                    for input_file in input_files}, output_file)
+
+    print("\nUpdated {} in {:.2f}s".format(output_file, time.perf_counter() - start))
+    return result
+
+
+def do_watch(file_or_folder_name, poll_interval=POLL_INTERVAL, debounce=DEBOUNCE):
+    # Update the BIN of an extracted folder, or ROCK_NEO.EXE, every time one of its files is saved
+    input_files, output_file, stamp_file = do_get_build_files(file_or_folder_name)
+
+    if not os.path.exists(output_file):
+        print("\n{} missing. Use -i to create it.".format(output_file))
+        return None
+
+    folders = sorted({os.path.dirname(os.path.abspath(input_file)) for input_file in input_files})
+    watch_fd = do_open_inotify(folders)
+    print("\nWatching {} files of {} ({}). Press Ctrl+C to stop.".format(
+        len(input_files), do_get_paths(file_or_folder_name)[0],
+        "inotify" if watch_fd is not None else "checking every {}s".format(poll_interval)))
+
+    states = do_get_states(input_files)
+    updates = 0
+
+    try:
+        while True:
+            do_wait_changes(watch_fd, poll_interval if watch_fd is None else 1)
+            new_states = do_get_states(input_files)
+            if new_states == states:
+                continue
+
+            # Wait for the files to stop changing
+            while True:
+                do_wait_changes(watch_fd, debounce)
+                last_states = new_states
+                new_states = do_get_states(input_files)
+                if new_states == last_states:
+                    break
+
+            changed_files = [input_file for input_file in input_files if new_states[input_file] != states[input_file]]
+            states = new_states
+            print("\nChanged: {}".format(", ".join(os.path.basename(changed_file) for changed_file in changed_files)))
+
+            # The first input is the manifest. A new one can add or remove files, so everything is inserted again
+            if input_files[0] in changed_files:
+                changed_files = None
+
+            if do_watch_update(file_or_folder_name, changed_files) is not None:
+                updates += 1
+
+            # The manifest may list other files now, maybe in folders that weren't there before
+            new_input_files = do_get_build_files(file_or_folder_name)[0]
+            if new_input_files != input_files:
+                input_files = new_input_files
+                states = do_get_states(input_files)
+                new_folders = sorted({os.path.dirname(os.path.abspath(input_file)) for input_file in input_files})
+                if watch_fd is not None and not do_add_inotify_watches(watch_fd, new_folders):
+                    os.close(watch_fd)
+                    watch_fd = None
+                    print("\nSome folders can't be watched with inotify. Checking every {}s".format(poll_interval))
+
+    except KeyboardInterrupt:
+        print("\nStopped watching after {} updates".format(updates))
+    finally:
+        if watch_fd is not None:
+            os.close(watch_fd)
+
+    return updates
@@ -1,205 +1 @@
-DashEditor.py -i DAT/ARM00L
-DashEditor.py -i DAT/ARM00R
-DashEditor.py -i DAT/ARM01R
-DashEditor.py -i DAT/ARM02R
-DashEditor.py -i DAT/ARM03R
-DashEditor.py -i DAT/ARM04L
-DashEditor.py -i DAT/ARM04R
-DashEditor.py -i DAT/ARM05R
-DashEditor.py -i DAT/ARM06R
-DashEditor.py -i DAT/ARM07R
-DashEditor.py -i DAT/ARM08R
-DashEditor.py -i DAT/ARM09R
-DashEditor.py -i DAT/ARM10R
-DashEditor.py -i DAT/ARM11R
-DashEditor.py -i DAT/ARM12R
-DashEditor.py -i DAT/ARM13R
-DashEditor.py -i DAT/BS16VAB1
-DashEditor.py -i DAT/DEMO_DAT
-DashEditor.py -i DAT/EXIT_MAP
-DashEditor.py -i DAT/EXIT_SUB
-DashEditor.py -i DAT/EXIT_SUP
-DashEditor.py -i DAT/FONT
-DashEditor.py -i DAT/GAMEOVER
-DashEditor.py -i DAT/GAUGE
-DashEditor.py -i DAT/HEAD00
-DashEditor.py -i DAT/HEAD01
-DashEditor.py -i DAT/INIT_DAT
-DashEditor.py -i DAT/KAIFONT
-DashEditor.py -i DAT/LEG00
-DashEditor.py -i DAT/LEG01
-DashEditor.py -i DAT/MAP_A1
-DashEditor.py -i DAT/MAP_A2
-DashEditor.py -i DAT/MAP_B1
-DashEditor.py -i DAT/MAP_B2
-DashEditor.py -i DAT/MAP_B3
-DashEditor.py -i DAT/ST00
-DashEditor.py -i DAT/ST00_00
-DashEditor.py -i DAT/ST00_01
-DashEditor.py -i DAT/ST00_02
-DashEditor.py -i DAT/ST00_03
-DashEditor.py -i DAT/ST00_04
-DashEditor.py -i DAT/ST01
-DashEditor.py -i DAT/ST02
-DashEditor.py -i DAT/ST02_00
-DashEditor.py -i DAT/ST02_01
-DashEditor.py -i DAT/ST02_02
-DashEditor.py -i DAT/ST03
-DashEditor.py -i DAT/ST03B
-DashEditor.py -i DAT/ST03_00
-DashEditor.py -i DAT/ST03_00B
-DashEditor.py -i DAT/ST03_00C
-DashEditor.py -i DAT/ST03_00D
-DashEditor.py -i DAT/ST03_03
-DashEditor.py -i DAT/ST03_05
-DashEditor.py -i DAT/ST03_06
-DashEditor.py -i DAT/ST03_07
-DashEditor.py -i DAT/ST03_08
-DashEditor.py -i DAT/ST04
-DashEditor.py -i DAT/ST04B
-DashEditor.py -i DAT/ST04_00
-DashEditor.py -i DAT/ST04_00B
-DashEditor.py -i DAT/ST04_00C
-DashEditor.py -i DAT/ST04_00D
-DashEditor.py -i DAT/ST04_00E
-DashEditor.py -i DAT/ST04_00F
-DashEditor.py -i DAT/ST04_01
-DashEditor.py -i DAT/ST04_02
-DashEditor.py -i DAT/ST04_03
-DashEditor.py -i DAT/ST04_04
-DashEditor.py -i DAT/ST04_05
-DashEditor.py -i DAT/ST05
-DashEditor.py -i DAT/ST05_00
-DashEditor.py -i DAT/ST05_00B
-DashEditor.py -i DAT/ST05_00C
-DashEditor.py -i DAT/ST05_00D
-DashEditor.py -i DAT/ST05_00E
-DashEditor.py -i DAT/ST05_00F
-DashEditor.py -i DAT/ST05_00G
-DashEditor.py -i DAT/ST05_00H
-DashEditor.py -i DAT/ST05_00I
-DashEditor.py -i DAT/ST05_00J
-DashEditor.py -i DAT/ST05_01
-DashEditor.py -i DAT/ST05_01C
-DashEditor.py -i DAT/ST05_02
-DashEditor.py -i DAT/ST05_04
-DashEditor.py -i DAT/ST06
-DashEditor.py -i DAT/ST06_00
-DashEditor.py -i DAT/ST06_00B
-DashEditor.py -i DAT/ST06_00C
-DashEditor.py -i DAT/ST06_00D
-DashEditor.py -i DAT/ST06_01
-DashEditor.py -i DAT/ST06_01B
-DashEditor.py -i DAT/ST06_02
-DashEditor.py -i DAT/ST06_02C
-DashEditor.py -i DAT/ST06_02D
-DashEditor.py -i DAT/ST06_03
-DashEditor.py -i DAT/ST06_04
-DashEditor.py -i DAT/ST07
-DashEditor.py -i DAT/ST07_00
-DashEditor.py -i DAT/ST07_05
-DashEditor.py -i DAT/ST07_05B
-DashEditor.py -i DAT/ST08
-DashEditor.py -i DAT/ST08_00
-DashEditor.py -i DAT/ST08_00B
-DashEditor.py -i DAT/ST08_00C
-DashEditor.py -i DAT/ST08_01
-DashEditor.py -i DAT/ST08_02
-DashEditor.py -i DAT/ST08_03
-DashEditor.py -i DAT/ST08_04
-DashEditor.py -i DAT/ST09
-DashEditor.py -i DAT/ST09_00
-DashEditor.py -i DAT/ST09_02
-DashEditor.py -i DAT/ST09_03
-DashEditor.py -i DAT/ST09_05
-DashEditor.py -i DAT/ST0A
-DashEditor.py -i DAT/ST0A_00
-DashEditor.py -i DAT/ST0A_00C
-DashEditor.py -i DAT/ST0A_00D
-DashEditor.py -i DAT/ST0B
-DashEditor.py -i DAT/ST0B_00
-DashEditor.py -i DAT/ST0B_00B
-DashEditor.py -i DAT/ST0B_00C
-DashEditor.py -i DAT/ST0B_00D
-DashEditor.py -i DAT/ST0B_00E
-DashEditor.py -i DAT/ST0B_01
-DashEditor.py -i DAT/ST0B_01B
-DashEditor.py -i DAT/ST0C
-DashEditor.py -i DAT/ST0CB
-DashEditor.py -i DAT/ST0CC
-DashEditor.py -i DAT/ST0D
-DashEditor.py -i DAT/ST0D_00
-DashEditor.py -i DAT/ST0D_00C
-DashEditor.py -i DAT/ST0D_00D
-DashEditor.py -i DAT/ST0D_01
-DashEditor.py -i DAT/ST0D_02
-DashEditor.py -i DAT/ST0D_03
-DashEditor.py -i DAT/ST0E
-DashEditor.py -i DAT/ST0F
-DashEditor.py -i DAT/ST0F_00
-DashEditor.py -i DAT/ST0F_02
-DashEditor.py -i DAT/ST0F_02B
-DashEditor.py -i DAT/ST0F_02C
-DashEditor.py -i DAT/ST0F_02D
-DashEditor.py -i DAT/ST0F_03
-DashEditor.py -i DAT/ST10
-DashEditor.py -i DAT/ST10B
-DashEditor.py -i DAT/ST10_00
-DashEditor.py -i DAT/ST10_00B
-DashEditor.py -i DAT/ST10_00C
-DashEditor.py -i DAT/ST10_01
-DashEditor.py -i DAT/ST10_02
-DashEditor.py -i DAT/ST10_03
-DashEditor.py -i DAT/ST10_04
-DashEditor.py -i DAT/ST10_05
-DashEditor.py -i DAT/ST11
-DashEditor.py -i DAT/ST11B
-DashEditor.py -i DAT/ST11_00
-DashEditor.py -i DAT/ST11_00B
-DashEditor.py -i DAT/ST11_00C
-DashEditor.py -i DAT/ST12
-DashEditor.py -i DAT/ST12_00
-DashEditor.py -i DAT/ST13
-DashEditor.py -i DAT/ST13_00
-DashEditor.py -i DAT/ST13_00B
-DashEditor.py -i DAT/ST14
-DashEditor.py -i DAT/ST14_00
-DashEditor.py -i DAT/ST14_00B
-DashEditor.py -i DAT/ST15
-DashEditor.py -i DAT/ST15_00
-DashEditor.py -i DAT/ST16
-DashEditor.py -i DAT/ST16_00
-DashEditor.py -i DAT/ST16_00B
-DashEditor.py -i DAT/ST17
-DashEditor.py -i DAT/ST17B
-DashEditor.py -i DAT/ST17C
-DashEditor.py -i DAT/ST18
-DashEditor.py -i DAT/ST18_00
-DashEditor.py -i DAT/ST19
-DashEditor.py -i DAT/ST19B
-DashEditor.py -i DAT/ST19C
-DashEditor.py -i DAT/ST19_00
-DashEditor.py -i DAT/ST19_03
-DashEditor.py -i DAT/ST1A
-DashEditor.py -i DAT/ST1A_00
-DashEditor.py -i DAT/ST1A_01
-DashEditor.py -i DAT/ST1A_01B
-DashEditor.py -i DAT/ST1A_01C
-DashEditor.py -i DAT/ST1A_02
-DashEditor.py -i DAT/ST1A_02B
-DashEditor.py -i DAT/ST1A_02C
-DashEditor.py -i DAT/ST1A_02D
-DashEditor.py -i DAT/ST1B
-DashEditor.py -i DAT/ST1B_00
-DashEditor.py -i DAT/ST1B_00B
-DashEditor.py -i DAT/ST1C
-DashEditor.py -i DAT/ST1D
-DashEditor.py -i DAT/ST1D_00
-DashEditor.py -i DAT/ST1D_01
-DashEditor.py -i DAT/ST1D_02
-DashEditor.py -i DAT/ST1E
-DashEditor.py -i DAT/ST1E_06
-DashEditor.py -i DAT/SUB_KEY
-DashEditor.py -i DAT/SUB_WPN
-DashEditor.py -i DAT/SUPPORT
-DashEditor.py -i DAT/SUPPORT2
\ No newline at end of file
+DashEditor.py -bi DAT